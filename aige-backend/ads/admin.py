@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Scene, AdConfiguration, UserProfile, GeneratedScript
+from .models import Scene, AdConfiguration, UserProfile, GeneratedScript, MediaAsset, UsageLedger
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -26,7 +26,19 @@ class AdConfigurationAdmin(admin.ModelAdmin):
 
 @admin.register(GeneratedScript)
 class GeneratedScriptAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'created_at')
+    list_display = ('id', 'user', 'variant_group', 'variant_rank', 'score', 'created_at')
+    ordering = ('-created_at',)
     readonly_fields = ('config', 'flow', 'script')
 
+@admin.register(MediaAsset)
+class MediaAssetAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'path', 'status', 'duration', 'width', 'height', 'created_at')
+    list_filter = ('status',)
+
+@admin.register(UsageLedger)
+class UsageLedgerAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'day', 'requests', 'generations', 'updated_at')
+    list_filter = ('day',)
+    search_fields = ('subject',)
+
 admin.site.register(UserProfile)
@@ -1,3 +1,5 @@
+import atexit
+
 from django.apps import AppConfig
 
 class AdsConfig(AppConfig):
@@ -6,3 +8,14 @@ class AdsConfig(AppConfig):
 
     def ready(self):
         import ads.signals
+        from ads import metrics
+        from ads.caching import collect_cache_metrics
+        from ads.dbpool import collect_pool_metrics
+        from ads.scheduler import collect_scheduler_metrics
+        metrics.register_collector(collect_pool_metrics)
+        metrics.register_collector(collect_cache_metrics)
+        metrics.register_collector(collect_scheduler_metrics)
+        from ads.quotas import flush_usage
+        # Write the last interval of batched usage when the worker exits
+        atexit.unregister(flush_usage)
+        atexit.register(flush_usage)
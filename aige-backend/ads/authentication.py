@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id):
+    return f"ads:auth:user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    Returns the user (with its profile preloaded) for a token user id, going to the
+    database only on a cache miss. Returns None if the user does not exist.
+    """
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = (
+            User.objects.select_related("userprofile")
+            .filter(**{api_settings.USER_ID_FIELD: user_id})
+            .first()
+        )
+        if user is not None:
+            cache.set(key, user, settings.AIGE_AUTH_CACHE_TTL)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through a short-TTL cache
+    instead of a DB query per request. Entries are dropped by the User/UserProfile
+    signals in ads.signals, so the TTL only bounds staleness across processes that
+    don't share a cache backend.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class TokenUserForReadsMixin:
+    """
+    When AIGE_AUTH_LEAN_READS is on, read-only requests authenticate with a stateless
+    TokenUser built from the JWT claims (no cache or DB lookup). Views using this must
+    only rely on ``request.user.id`` for safe methods.
+    """
+
+    def get_authenticators(self):
+        if settings.AIGE_AUTH_LEAN_READS and self.request.method in SAFE_METHODS:
+            return [JWTStatelessUserAuthentication()]
+        return super().get_authenticators()
@@ -0,0 +1,477 @@
+"""
+Offline benchmarks for the script generation pipeline.
+
+Everything here runs against a fake Gemini model so the numbers only depend on
+our own code (auth, parsing, preprocessing, post-processing, DB writes) plus a
+configurable, deterministic model latency. Use the ``bench_pipeline``
+management command to run them.
+"""
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from . import jsoncodec
+from .flow_preprocess import preprocess_flow_for_script
+from .label_sync import apply_label_updates, choice_label_updates
+
+DEFAULT_SEED = 1234
+
+
+class FakeGenerativeModel:
+    """
+    Stand-in for ``genai.GenerativeModel`` with configurable latency and token throughput.
+    The response time is ``latency_ms`` plus the time it takes to "stream" the output
+    tokens at ``tokens_per_second``.
+    """
+
+    def __init__(self, model_name=None, latency_ms=0.0, tokens_per_second=0.0, script=None):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.script = script if script is not None else sample_script()
+
+    def generate_content(self, prompt, **kwargs):
+        delay = self.latency_ms / 1000.0
+        if self.tokens_per_second:
+            delay += estimate_tokens(self.script) / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+        return SimpleNamespace(text=self.script)
+
+
+def fake_model_factory(latency_ms=0.0, tokens_per_second=0.0, script=None):
+    """
+    Returns a callable that can replace ``genkit_service.get_generative_model``.
+    """
+    def factory(model_name=None, **kwargs):
+        return FakeGenerativeModel(model_name, latency_ms, tokens_per_second, script)
+    return factory
+
+
+def estimate_tokens(text):
+    # Rough heuristic used by Gemini docs: ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+def sample_script():
+    """
+    A representative 5-scene script, including a stray choice_point object so
+    fix_choice_points has real work to do.
+    """
+    scenes = [
+        {"scene_id": "1", "visual": "A sunrise over the village", "dialogue": "Father: Ready?", "audio": "Birdsong"},
+        {"scene_id": "choice_1", "post_scene_choice_prompt": "Where to?",
+         "option_a_text": "Climb the hill", "option_b_text": "Cross the river",
+         "option_a_leads_to": "3", "option_b_leads_to": "4"},
+        {"scene_id": "3", "visual": "Hill climb", "dialogue": "Child: Race you!", "audio": "Wind"},
+        {"scene_id": "4", "visual": "River crossing", "dialogue": "Father: Careful!", "audio": "Water"},
+        {"scene_id": "5", "visual": "Mini game: catch the fish", "dialogue": "Tap to catch", "audio": "Upbeat"},
+        {"scene_id": "6", "visual": "Home at dusk", "dialogue": "Narrator: Every path leads home.", "audio": "Strings"},
+    ]
+    return json.dumps(scenes, ensure_ascii=False)
+
+
+def sample_config():
+    return {
+        "theme_prompt": "Father and child in village",
+        "tone": "emotional",
+        "characters_or_elements": "Father, Child, Village",
+        "brandVoice": "warm",
+        "platform": "mobile",
+        "language": "english",
+        "durationInSeconds": 30,
+    }
+
+
+def make_flow(num_scenes, seed=DEFAULT_SEED):
+    """
+    Builds a deterministic branching flow with ``num_scenes`` scene nodes.
+    Every other scene leads to a choice point whose two options point at later scenes.
+    """
+    rng = random.Random(seed)
+    nodes = []
+    edges = []
+    for i in range(num_scenes):
+        scene_id = f"s{i}"
+        nodes.append({
+            "id": scene_id,
+            "type": "scene",
+            "position": {"x": i * 200, "y": 0},
+            "data": {"nodeType": "Scene", "title": f"Scene {i}", "description": "x" * rng.randint(20, 200)},
+        })
+        if i % 2 == 0 and i + 2 < num_scenes:
+            choice_id = f"c{i}"
+            nodes.append({
+                "id": choice_id,
+                "type": "choice_point",
+                "position": {"x": i * 200 + 100, "y": 100},
+                "data": {
+                    "nodeType": "choice_point",
+                    "description": f"Choice after scene {i}",
+                    "options": [
+                        {"label": f"Go to {i + 1}", "nextSceneId": f"s{i + 1}"},
+                        {"label": f"Go to {i + 2}", "nextSceneId": f"s{i + 2}"},
+                    ],
+                },
+            })
+            edges.append({"id": f"e{scene_id}-{choice_id}", "source": scene_id, "target": choice_id})
+            edges.append({"id": f"e{choice_id}-a", "source": choice_id, "target": f"s{i + 1}"})
+            edges.append({"id": f"e{choice_id}-b", "source": choice_id, "target": f"s{i + 2}"})
+        elif i + 1 < num_scenes:
+            edges.append({"id": f"e{scene_id}", "source": scene_id, "target": f"s{i + 1}"})
+    return {"nodes": nodes, "edges": edges}
+
+
+def percentiles(samples_ms):
+    """
+    Summarises a list of millisecond samples.
+    """
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+
+    def pick(q):
+        idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return round(ordered[idx], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def bench_preprocess(sizes=(10, 100, 1000, 5000), repeat=20):
+    """
+    Cost of preprocess_flow_for_script for flows of increasing size.
+    """
+    results = {}
+    for size in sizes:
+        flow = make_flow(size)
+        samples = [_timed(preprocess_flow_for_script, flow) for _ in range(repeat)]
+        results[str(size)] = percentiles(samples)
+    return results
+
+
+def make_label_script(flow):
+    """
+    A generated script that renames every choice of ``flow``.
+    """
+    scenes = []
+    for node in flow["nodes"]:
+        if node["type"] == "scene":
+            scenes.append({"scene_id": node["id"], "visual": "v"})
+        else:
+            scenes[-1].update({"post_scene_choice_prompt": "Pick one", "option_a_text": "Left", "option_b_text": "Right"})
+    return jsoncodec.dumps(scenes)
+
+
+def bench_label_sync(sizes=(10, 100, 1000, 5000), repeat=20):
+    """
+    Cost of mapping a script's choice text back onto the flow (parse, index, diff, apply).
+    """
+    results = {}
+    for size in sizes:
+        flow = make_flow(size)
+        script = make_label_script(flow)
+
+        def sync():
+            apply_label_updates(flow["nodes"], choice_label_updates(script, flow))
+
+        results[str(size)] = percentiles([_timed(sync) for _ in range(repeat)])
+    return results
+
+
+def _peak_kib(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return round(tracemalloc.get_traced_memory()[1] / 1024.0, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_json(sizes=(100, 1000, 5000), repeat=20):
+    """
+    Parse/serialise time and peak allocations for large flows, stdlib ``json`` vs
+    the ads.jsoncodec backend in use.
+    """
+    codecs = {
+        "stdlib": (lambda obj: json.dumps(obj, ensure_ascii=False), json.loads),
+        jsoncodec.BACKEND: (jsoncodec.dumps, jsoncodec.loads),
+    }
+    results = {"backend": jsoncodec.BACKEND}
+    for size in sizes:
+        flow = make_flow(size)
+        encoded = json.dumps(flow, ensure_ascii=False)
+        per_size = {"bytes": len(encoded.encode("utf-8"))}
+        for name, (dumps, loads) in codecs.items():
+            per_size[name] = {
+                "serialize": percentiles([_timed(dumps, flow) for _ in range(repeat)]),
+                "parse": percentiles([_timed(loads, encoded) for _ in range(repeat)]),
+                "serialize_peak_kib": _peak_kib(dumps, flow),
+                "parse_peak_kib": _peak_kib(loads, encoded),
+            }
+        results[str(size)] = per_size
+    return results
+
+
+def bench_db_writes(user, count=200, flow_size=10):
+    """
+    Cost of persisting GeneratedScript rows one at a time, as the view does.
+    """
+    from .models import GeneratedScript
+
+    config = sample_config()
+    flow = make_flow(flow_size)
+    script = sample_script()
+    samples = [
+        _timed(GeneratedScript.objects.create, user=user, config=config, flow=flow, script=script)
+        for _ in range(count)
+    ]
+    return percentiles(samples)
+
+
+def _connection_modes(settings_dict):
+    base = dict(settings_dict, OPTIONS={k: v for k, v in settings_dict["OPTIONS"].items() if k != "pool"})
+    modes = {
+        "fresh": dict(base, CONN_MAX_AGE=0),
+        "persistent": dict(base, CONN_MAX_AGE=600),
+    }
+    try:
+        import psycopg_pool  # noqa: F401
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    except ImportError:
+        is_psycopg3 = False
+    if settings_dict["ENGINE"] == "django.db.backends.postgresql" and is_psycopg3:
+        modes["pooled"] = dict(base, CONN_MAX_AGE=0,
+                               OPTIONS=dict(base["OPTIONS"], pool={"min_size": 1, "max_size": 4}))
+    return modes
+
+
+def bench_db_connections(requests=200):
+    """
+    Per-request cost of getting a DB connection and running one query, comparing a fresh
+    connection per request, persistent connections and the psycopg pool. Each iteration
+    ends with the same cleanup Django runs when a request finishes.
+    """
+    from django.db import connections
+    from django.db.utils import load_backend
+
+    results = {}
+    settings_dict = connections["default"].settings_dict
+    for mode, mode_settings in _connection_modes(settings_dict).items():
+        backend = load_backend(mode_settings["ENGINE"])
+        conn = backend.DatabaseWrapper(mode_settings, alias=f"bench_{mode}")
+
+        def one_request():
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            conn.close_if_unusable_or_obsolete()
+
+        try:
+            one_request()  # warm up (pool open, first connect)
+            results[mode] = percentiles([_timed(one_request) for _ in range(requests)])
+        finally:
+            conn.close()
+            if getattr(conn, "pool", None) is not None:
+                conn.close_pool()
+    return results
+
+
+def _post_generate(user, payload):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    start = time.perf_counter()
+    response = client.post("/api/generate-script/", payload, format="json")
+    elapsed = (time.perf_counter() - start) * 1000.0
+    if response.status_code != 200:
+        raise RuntimeError(f"generate-script returned {response.status_code}: {response.content[:200]!r}")
+    if threading.current_thread() is not threading.main_thread():
+        connection.close()
+    return elapsed
+
+
+def bench_endpoint(user, iterations=50, flow_size=10):
+    """
+    End-to-end latency of /api/generate-script/ through the Django test client.
+    """
+    payload = {"config": sample_config(), "flow": make_flow(flow_size)}
+    samples = [_post_generate(user, payload) for _ in range(iterations)]
+    return percentiles(samples)
+
+
+def bench_concurrency(user, concurrency=8, requests=64, flow_size=10):
+    """
+    Throughput of /api/generate-script/ with ``concurrency`` client threads.
+    """
+    payload = {"config": sample_config(), "flow": make_flow(flow_size)}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda _: _post_generate(user, payload), range(requests)))
+    wall = time.perf_counter() - start
+    result = percentiles(samples)
+    result["concurrency"] = concurrency
+    result["throughput_rps"] = round(requests / wall, 3) if wall else 0.0
+    return result
+
+
+def bench_mixed_load(latency_ms=50.0, capacity=4, batch_jobs=64, interactive_jobs=16):
+    """
+    Interactive request latency while one tenant has ``batch_jobs`` queued, with fair
+    queuing ("fair") and with every request in a single FIFO flow ("fifo").
+    """
+    from .scheduler import BATCH, INTERACTIVE, FairScheduler, generation_context
+
+    def run(fair):
+        scheduler = FairScheduler(capacity)
+
+        def job(tenant, priority):
+            start = time.perf_counter()
+            with generation_context(tenant, priority) if fair else generation_context("all", BATCH):
+                with scheduler.slot():
+                    time.sleep(latency_ms / 1000)
+            return (time.perf_counter() - start) * 1000
+
+        with ThreadPoolExecutor(max_workers=batch_jobs + interactive_jobs) as pool:
+            batch = [pool.submit(job, "agency", BATCH) for _ in range(batch_jobs)]
+            time.sleep(latency_ms / 1000)  # users arrive once the batch is queued
+            interactive = [pool.submit(job, f"user{i}", INTERACTIVE) for i in range(interactive_jobs)]
+            result = percentiles([f.result() for f in interactive])
+            for f in batch:
+                f.result()
+        return result
+
+    return {"fair": run(True), "fifo": run(False)}
+
+
+def import_time_report(module="aige.urls"):
+    """
+    Imports ``module`` after django.setup() in a fresh interpreter under
+    ``python -X importtime`` and returns ``{"total_ms", "module_ms", "modules"}``, where
+    ``modules`` maps every imported module to its cumulative import time in ms.
+    """
+    from django.conf import settings
+
+    code = f"import django; django.setup(); import {module}"
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "aige.settings"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative) / 1000
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+    return {
+        "total_ms": round(total_us / 1000, 3),
+        "module_ms": modules.get(module, 0.0),
+        "modules": modules,
+    }
+
+
+def slowest_imports(report, count=10):
+    return sorted(report["modules"].items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def bench_imports(samples=3):
+    """
+    Cold-start import cost of the URLconf (what every worker and manage.py check pays).
+    Best of ``samples`` fresh interpreters.
+    """
+    reports = [import_time_report("aige.urls") for _ in range(samples)]
+    return {
+        "startup_ms": min(r["total_ms"] for r in reports),
+        "urlconf_ms": min(r["module_ms"] for r in reports),
+    }
+
+
+def run_benchmarks(user, latency_ms=50.0, tokens_per_second=0.0, iterations=50,
+                   concurrency=8, preprocess_sizes=(10, 100, 1000, 5000), db_writes=200):
+    """
+    Runs the whole suite with the fake model patched in and returns a JSON-serialisable dict.
+    """
+    from . import genkit_service
+
+    factory = fake_model_factory(latency_ms, tokens_per_second)
+    results = {
+        "params": {
+            "latency_ms": latency_ms,
+            "tokens_per_second": tokens_per_second,
+            "iterations": iterations,
+            "concurrency": concurrency,
+        },
+    }
+    from django.test import override_settings
+
+    # Measure the pipeline, not quota refusals
+    unlimited = override_settings(AIGE_QUOTA_USER_DAILY=0, AIGE_QUOTA_ORG_DAILY=0)
+    with patch.object(genkit_service, "get_generative_model", factory), unlimited:
+        results["endpoint"] = bench_endpoint(user, iterations)
+        results["concurrency"] = bench_concurrency(user, concurrency, max(concurrency, iterations))
+    results["preprocess"] = bench_preprocess(preprocess_sizes)
+    results["json"] = bench_json(preprocess_sizes)
+    results["label_sync"] = bench_label_sync(preprocess_sizes)
+    results["db_write"] = bench_db_writes(user, db_writes)
+    results["db_connection"] = bench_db_connections(db_writes)
+    results["mixed_load"] = bench_mixed_load(latency_ms)
+    results["imports"] = bench_imports()
+    return results
+
+
+def _flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2, min_delta_ms=0.5):
+    """
+    Returns a list of human readable regressions. Metrics ending in ``_ms`` are
+    lower-is-better, metrics ending in ``_rps`` are higher-is-better. Latency changes
+    smaller than ``min_delta_ms`` are treated as noise.
+    """
+    current = _flatten(results)
+    previous = _flatten(baseline)
+    regressions = []
+    for name, old in previous.items():
+        new = current.get(name)
+        if new is None or name.startswith("params.") or not old:
+            continue
+        if name.endswith("_ms") and new > old * (1 + tolerance) and new - old >= min_delta_ms:
+            regressions.append(f"{name}: {old} -> {new}")
+        elif name.endswith("_rps") and new < old * (1 - tolerance):
+            regressions.append(f"{name}: {old} -> {new}")
+    return regressions
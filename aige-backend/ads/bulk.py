@@ -0,0 +1,188 @@
+"""
+Streaming NDJSON import/export of scenes and ad configurations.
+
+Each line is one object with a ``type`` of ``scene`` or ``config`` and a file-local
+``ref``. Scenes point at each other through ``next_scene_a``/``next_scene_b`` refs,
+which are resolved in memory, so a whole campaign graph can be loaded without
+patching foreign keys afterwards:
+
+    {"type": "scene", "ref": "intro", "title": "Intro", "next_scene_a": "left", "next_scene_b": "right"}
+    {"type": "scene", "ref": "left", "title": "Left"}
+    {"type": "config", "ref": "c1", "theme_prompt": "Village", "tone": "warm", "nodes": [], "edges": []}
+
+Export writes the same format (refs are the source primary keys), so an export can
+be imported into another account as-is.
+"""
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, jsoncodec
+from .models import AdConfiguration, Scene
+
+SCENE_FIELDS = ('title', 'description', 'video_url_a', 'label_a', 'video_url_b', 'label_b')
+SCENE_LINKS = ('next_scene_a', 'next_scene_b')
+CONFIG_FIELDS = ('theme_prompt', 'tone', 'characters_or_elements', 'enable_ar_filters',
+                 'include_mini_game', 'nodes', 'edges')
+
+DEFAULT_BATCH_SIZE = 500
+
+_json_default = DjangoJSONEncoder().default
+
+
+class BulkImportError(ValueError):
+    def __init__(self, message, line=None):
+        self.line = line
+        super().__init__(f"line {line}: {message}" if line is not None else message)
+
+
+class _Batch:
+    def __init__(self):
+        self.scenes = []  # [(ref, Scene, {link_field: target_ref})]
+        self.configs = []
+
+    def __len__(self):
+        return len(self.scenes) + len(self.configs)
+
+
+def _parse_line(raw, line_no, user):
+    try:
+        record = jsoncodec.loads(raw)
+    except ValueError as e:
+        raise BulkImportError(f"invalid JSON ({e})", line_no)
+    if not isinstance(record, dict):
+        raise BulkImportError("expected a JSON object", line_no)
+
+    kind = record.get('type')
+    if kind == 'scene':
+        model, fields, exclude = Scene, SCENE_FIELDS, ['user', *SCENE_LINKS]
+    elif kind == 'config':
+        model, fields, exclude = AdConfiguration, CONFIG_FIELDS, ['user']
+    else:
+        raise BulkImportError(f"unknown type {kind!r}", line_no)
+
+    obj = model(user=user, **{f: record[f] for f in fields if f in record and record[f] is not None})
+    try:
+        obj.clean_fields(exclude=exclude)
+    except ValidationError as e:
+        raise BulkImportError(str(e.message_dict), line_no)
+
+    ref = record.get('ref')
+    links = {f: str(record[f]) for f in SCENE_LINKS if kind == 'scene' and record.get(f) is not None}
+    return kind, (str(ref) if ref is not None else None), obj, links
+
+
+def _flush(batch, scene_ids, pending):
+    """
+    Inserts one batch in a single transaction and wires up every scene link whose
+    target is already known. Links to scenes in later batches are left in ``pending``.
+    """
+    with transaction.atomic():
+        Scene.objects.bulk_create([obj for _, obj, _ in batch.scenes])
+        AdConfiguration.objects.bulk_create(batch.configs)
+        for ref, obj, _ in batch.scenes:
+            if ref is not None:
+                scene_ids[ref] = obj.pk
+
+        linked = []
+        for _, obj, links in batch.scenes:
+            resolved = False
+            for field, target in links.items():
+                if target in scene_ids:
+                    setattr(obj, f"{field}_id", scene_ids[target])
+                    resolved = True
+                else:
+                    pending.append((obj.pk, field, target))
+            if resolved:
+                linked.append(obj)
+        if linked:
+            Scene.objects.bulk_update(linked, [f"{f}_id" for f in SCENE_LINKS])
+        # bulk_create/bulk_update don't send model signals
+        if batch.scenes:
+            caching.invalidate(Scene._meta.label_lower, batch.scenes[0][1].user_id)
+        if batch.configs:
+            caching.invalidate(AdConfiguration._meta.label_lower, batch.configs[0].user_id)
+
+
+def _resolve_pending(pending, scene_ids):
+    now = timezone.now()
+    updates = {}
+    unresolved = []
+    for pk, field, target in pending:
+        if target in scene_ids:
+            updates.setdefault(pk, {})[f"{field}_id"] = scene_ids[target]
+        else:
+            unresolved.append(target)
+    if updates:
+        with transaction.atomic():
+            scenes = list(Scene.objects.filter(pk__in=updates.keys()))
+            for scene in scenes:
+                for attr, value in updates[scene.pk].items():
+                    setattr(scene, attr, value)
+                scene.updated_at = now
+            Scene.objects.bulk_update(scenes, [f"{f}_id" for f in SCENE_LINKS] + ['updated_at'])
+            caching.invalidate(Scene._meta.label_lower, scenes[0].user_id)
+    return sorted(set(unresolved))
+
+
+def import_ndjson(lines, user, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Imports scenes and configs for ``user`` from an iterable of NDJSON lines (str or
+    bytes). Rows are inserted with bulk_create in one transaction per batch; a bad
+    line raises BulkImportError and leaves earlier batches committed.
+
+    Returns ``{"scenes": n, "configs": n, "unresolved_refs": [...]}``; unresolved refs
+    are links to scenes that never appeared in the input and are left empty.
+    """
+    scene_ids = {}
+    seen_refs = set()
+    pending = []
+    counts = {'scenes': 0, 'configs': 0}
+    batch = _Batch()
+
+    for line_no, raw in enumerate(lines, start=1):
+        if not raw.strip():
+            continue
+        kind, ref, obj, links = _parse_line(raw, line_no, user)
+        if kind == 'scene':
+            if ref is not None:
+                if ref in seen_refs:
+                    raise BulkImportError(f"duplicate scene ref {ref!r}", line_no)
+                seen_refs.add(ref)
+            batch.scenes.append((ref, obj, links))
+            counts['scenes'] += 1
+        else:
+            batch.configs.append(obj)
+            counts['configs'] += 1
+        if len(batch) >= batch_size:
+            _flush(batch, scene_ids, pending)
+            batch = _Batch()
+
+    if len(batch):
+        _flush(batch, scene_ids, pending)
+    counts['unresolved_refs'] = _resolve_pending(pending, scene_ids)
+    return counts
+
+
+def export_ndjson(user, chunk_size=1000):
+    """
+    Yields NDJSON lines (bytes) for all of ``user``'s scenes and configs. Rows are read
+    with ``iterator()``, which uses server-side cursors on PostgreSQL, so memory stays
+    constant regardless of account size.
+    """
+    scene_columns = ('pk', *SCENE_FIELDS, *(f"{f}_id" for f in SCENE_LINKS))
+    scenes = Scene.objects.filter(user=user).order_by('pk').values(*scene_columns)
+    for row in scenes.iterator(chunk_size=chunk_size):
+        record = {'type': 'scene', 'ref': str(row.pop('pk'))}
+        record.update({f: row[f] for f in SCENE_FIELDS})
+        for field in SCENE_LINKS:
+            target = row[f"{field}_id"]
+            record[field] = str(target) if target is not None else None
+        yield jsoncodec.dumps_bytes(record, default=_json_default) + b'\n'
+
+    configs = AdConfiguration.objects.filter(user=user).order_by('pk').values('pk', *CONFIG_FIELDS)
+    for row in configs.iterator(chunk_size=chunk_size):
+        record = {'type': 'config', 'ref': str(row.pop('pk'))}
+        record.update(row)
+        yield jsoncodec.dumps_bytes(record, default=_json_default) + b'\n'
@@ -0,0 +1,200 @@
+"""
+Two-level read cache for the config/scene viewsets.
+
+Level 1 is a small per-process LRU, level 2 the shared Django cache. Keys embed a
+per-(model, user) version number that lives in the shared cache and is bumped by the
+post_save/post_delete handlers in ads.signals, so a write makes every cached list page,
+detail object and ETag for that user unreachable at once — on every worker, as long as
+the shared cache is shared (see CACHES in settings).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """
+    Thread-safe, size-bounded LRU mapping.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local = LocalLRU(getattr(settings, "AIGE_LOCAL_CACHE_SIZE", 1024))
+_stats_lock = threading.Lock()
+_stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+    stats["hit_ratio"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+    stats["local_entries"] = len(_local)
+    return stats
+
+
+def reset_local_cache():
+    """
+    Drops the per-process level and the counters (used by tests).
+    """
+    _local.clear()
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _version_key(model_label, user_id):
+    return f"ads:ver:{model_label}:{user_id}"
+
+
+def _fresh_version():
+    # Versions start from the clock so that a version key evicted from the shared
+    # cache can never come back with a number that old data was stored under.
+    return time.time_ns() // 1000
+
+
+def get_version(model_label, user_id):
+    key = _version_key(model_label, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(model_label, user_id):
+    key = _version_key(model_label, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _fresh_version(), None)
+
+
+def invalidate(model_label, user_id):
+    """
+    Makes every cached entry for (model, user) unreachable. Bumped immediately and
+    again on commit, so a reader that raced the open transaction and cached the old
+    rows under the new version is invalidated too.
+    """
+    _count("invalidations")
+    _bump(model_label, user_id)
+    transaction.on_commit(lambda: _bump(model_label, user_id))
+
+
+def get_or_set(model_label, user_id, suffix, compute):
+    """
+    Returns the cached value for ``suffix`` under the current (model, user) version,
+    computing and storing it in both levels on a miss. ``None`` results are not cached.
+    """
+    if not getattr(settings, "AIGE_READ_CACHE", True):
+        return compute()
+    key = f"ads:data:{model_label}:{user_id}:v{get_version(model_label, user_id)}:{suffix}"
+
+    value = _local.get(key, _MISSING)
+    if value is not _MISSING:
+        _count("local_hits")
+        return value
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count("shared_hits")
+        _local.set(key, value)
+        return value
+
+    _count("misses")
+    value = compute()
+    if value is not None:
+        cache.set(key, value, getattr(settings, "AIGE_READ_CACHE_TTL", 300))
+        _local.set(key, value)
+    return value
+
+
+class CachedReadMixin:
+    """
+    Serves list pages, detail payloads and their ETags from the two-level cache.
+    Must come before ConditionalGetMixin in the bases.
+    """
+
+    def _cache_scope(self):
+        return self.get_queryset().model._meta.label_lower, self.request.user.id
+
+    def compute_list_etag(self, request):
+        query = request.META.get("QUERY_STRING", "")
+        return get_or_set(*self._cache_scope(), f"etag:list:{query}", lambda: super(CachedReadMixin, self).compute_list_etag(request))
+
+    def compute_detail_etag(self, request, lookup_value):
+        return get_or_set(*self._cache_scope(), f"etag:detail:{lookup_value}",
+                          lambda: super(CachedReadMixin, self).compute_detail_etag(request, lookup_value))
+
+    def render_list(self, request, *args, **kwargs):
+        query = request.META.get("QUERY_STRING", "")
+        data = get_or_set(*self._cache_scope(), f"list:{query}",
+                          lambda: _plain(super(CachedReadMixin, self).render_list(request, *args, **kwargs).data))
+        return Response(data)
+
+    def render_detail(self, request, lookup_value, *args, **kwargs):
+        data = get_or_set(*self._cache_scope(), f"detail:{lookup_value}",
+                          lambda: _plain(super(CachedReadMixin, self).render_detail(request, lookup_value, *args, **kwargs).data))
+        return Response(data)
+
+
+def _plain(data):
+    # ReturnList/ReturnDict keep a reference to the serializer; don't pickle that
+    if isinstance(data, list):
+        return list(data)
+    if isinstance(data, dict):
+        return dict(data)
+    return data
+
+
+def collect_cache_metrics():
+    stats = cache_stats()
+    return [
+        ("aige_read_cache_lookups_total", "counter", "Read cache lookups by result.", [
+            ({"result": "local_hit"}, stats["local_hits"]),
+            ({"result": "shared_hit"}, stats["shared_hits"]),
+            ({"result": "miss"}, stats["misses"]),
+        ]),
+        ("aige_read_cache_hit_ratio", "gauge", "Fraction of lookups served from either level.", [({}, stats["hit_ratio"])]),
+        ("aige_read_cache_invalidations_total", "counter", "Version bumps from model signals.", [({}, stats["invalidations"])]),
+        ("aige_read_cache_local_entries", "gauge", "Entries in this process's LRU.", [({}, stats["local_entries"])]),
+    ]
@@ -0,0 +1,95 @@
+"""
+Version-based ETags and conditional GETs for the config/scene viewsets.
+
+ETags come from the ``updated_at`` column (plus row count for lists), so a matching
+``If-None-Match`` is answered with a 304 after a single narrow query, without loading
+the JSON columns or running the serializer.
+"""
+import zlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _micros(dt):
+    return int(dt.timestamp() * 1_000_000) if dt else 0
+
+
+def detail_etag(pk, updated_at):
+    return f'W/"{pk}-{_micros(updated_at)}"'
+
+
+def list_etag(user_id, count, last_updated, query_string=""):
+    query = zlib.crc32(query_string.encode()) if query_string else 0
+    return f'W/"u{user_id}-{count}-{_micros(last_updated)}-{query:x}"'
+
+
+def etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if "*" in candidates:
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.removeprefix("W/") == bare for candidate in candidates)
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag / If-None-Match handling to ``list`` and ``retrieve`` of a ModelViewSet
+    whose model has an ``updated_at`` auto_now column. The compute_*/render_* hooks
+    are the extension points used by ads.caching.CachedReadMixin.
+    """
+
+    def _conditional(self, request, etag, render):
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = render()
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def compute_list_etag(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        stats = queryset.order_by().aggregate(count=Count("pk"), last_updated=Max("updated_at"))
+        return list_etag(request.user.id, stats["count"], stats["last_updated"], request.META.get("QUERY_STRING", ""))
+
+    def compute_detail_etag(self, request, lookup_value):
+        """
+        Returns the ETag for one object, or None if it doesn't exist for this user.
+        """
+        try:
+            row = (
+                self.filter_queryset(self.get_queryset())
+                .filter(**{self.lookup_field: lookup_value})
+                .values_list("pk", "updated_at")
+                .first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            return None
+        return detail_etag(*row) if row is not None else None
+
+    def render_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def render_detail(self, request, lookup_value, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        etag = self.compute_list_etag(request)
+        return self._conditional(request, etag, lambda: self.render_list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_value = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        etag = self.compute_detail_etag(request, lookup_value)
+        if etag is None:
+            # Let the regular path raise the 404
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional(request, etag, lambda: self.render_detail(request, lookup_value, *args, **kwargs))
@@ -0,0 +1,45 @@
+"""
+Connection pool observability. Exposed on /metrics through ads.metrics.
+"""
+from django.db import connections
+
+
+def pool_stats(alias="default"):
+    """
+    Returns psycopg_pool statistics for ``alias`` or None when the alias isn't pooled.
+    ``get_stats`` keeps the cumulative counters (requests_num, requests_wait_ms, ...).
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    return pool.get_stats()
+
+
+# (stats key, metric name, type, help)
+_POOL_METRICS = (
+    ("pool_size", "aige_db_pool_size", "gauge", "Connections currently managed by the pool."),
+    ("pool_available", "aige_db_pool_available", "gauge", "Idle connections ready to be handed out."),
+    ("requests_waiting", "aige_db_pool_requests_waiting", "gauge", "Requests queued waiting for a connection."),
+    ("requests_num", "aige_db_pool_requests_total", "counter", "Connections requested from the pool."),
+    ("requests_queued", "aige_db_pool_requests_queued_total", "counter", "Requests that had to wait for a connection."),
+    ("requests_wait_ms", "aige_db_pool_requests_wait_ms_total", "counter", "Total time spent waiting for a connection."),
+    ("requests_errors", "aige_db_pool_requests_errors_total", "counter", "Requests that timed out or failed."),
+    ("connections_num", "aige_db_pool_connections_total", "counter", "Connections opened by the pool."),
+    ("connections_ms", "aige_db_pool_connections_ms_total", "counter", "Total time spent opening connections."),
+    ("usage_ms", "aige_db_pool_usage_ms_total", "counter", "Total time connections were checked out."),
+)
+
+
+def collect_pool_metrics():
+    samples = {}
+    for conn in connections.all():
+        stats = pool_stats(conn.alias)
+        if stats is None:
+            continue
+        for key, name, _, _ in _POOL_METRICS:
+            samples.setdefault(name, []).append(({"alias": conn.alias}, stats.get(key, 0)))
+    return [
+        (name, metric_type, help_text, samples[name])
+        for _, name, metric_type, help_text in _POOL_METRICS
+        if name in samples
+    ]
@@ -1,14 +1,41 @@
 import os
-import json
-import google.generativeai as genai
+import threading
+from . import jsoncodec
 from .flow_preprocess import preprocess_flow_for_script
+from .profiling import span
+from .scheduler import get_scheduler
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+GEMINI_MODEL = "gemini-1.5-flash"
 
-def generate_structured_ad_script(config: dict, flow: dict) -> str:
+# google.generativeai (and the grpc/protobuf stack under it) takes most of a second to
+# import, and this module is reached from aige.urls. Load it on first generation instead
+# so workers, manage.py commands and tests that never generate don't pay for it.
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def get_genai():
+    """
+    Imports and configures the Gemini SDK once, on first use.
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                _genai = genai
+    return _genai
+
+
+def get_generative_model(name: str = GEMINI_MODEL):
+    return get_genai().GenerativeModel(name)
+
+
+def generate_structured_ad_script(config: dict, flow: dict, variant_hint: str = "") -> str:
     """
     Generate a scene-by-scene, video-compatible interactive ad script in structured JSON using Gemini (Google GenAI).
+    ``variant_hint`` steers one candidate of a multi-variant request (e.g. a different tone or hook).
     """
 
     characters_or_elements = config.get("characters_or_elements", "").strip()
@@ -16,10 +43,40 @@ def generate_structured_ad_script(config: dict, flow: dict) -> str:
         raise ValueError("No characters or elements specified. Please provide characters or elements for the story.")
 
     # Preprocess the flow to embed choice points into scenes
-    preprocessed_flow = preprocess_flow_for_script(flow)
-    flow_json = json.dumps(preprocessed_flow, ensure_ascii=False)
+    with span("preprocess"):
+        preprocessed_flow = preprocess_flow_for_script(flow)
+
+    with span("prompt"):
+        prompt = _build_prompt(config, characters_or_elements, jsoncodec.dumps(preprocessed_flow))
+        if variant_hint:
+            prompt += f"\n--- VARIANT DIRECTION ---\n{variant_hint} Keep the structure and rules above unchanged.\n"
+
+    # Fair-share admission: interactive requests overtake queued batch work
+    scheduler = get_scheduler()
+    with span("queue"):
+        scheduler.acquire()
+    try:
+        with span("model"):
+            model = get_generative_model()
+            response = model.generate_content(prompt)
+    except Exception as e:
+        raise RuntimeError(f"Gemini structured script generation failed: {str(e)}")
+    finally:
+        scheduler.release()
 
-    prompt = f"""
+    try:
+        script_text = response.text.strip() if hasattr(response, "text") else str(response)
+
+        with span("fix_choice_points"):
+            script_text = fix_choice_points(script_text)
+        return script_text
+
+    except Exception as e:
+        raise RuntimeError(f"Gemini structured script generation failed: {str(e)}")
+
+
+def _build_prompt(config: dict, characters_or_elements: str, flow_json: str) -> str:
+    return f"""
 You are an expert interactive ad scriptwriter and narrative designer for AI-generated video ads.
 
 Your task is to generate a structured, scene-by-scene script for a branching, interactive video ad experience — not a linear video. Each scene will be rendered as an AI-generated video based on your script.
@@ -74,42 +131,31 @@ If the scene leads into a choice (only the opening scene):
 Begin. Output only the JSON array:
 """
 
-    try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
-        script_text = response.text.strip() if hasattr(response, "text") else str(response)
-
-        # --- POST-PROCESSING: Remove any stray choice_point nodes and embed their data into the preceding scene ---
-        def fix_choice_points(script_json_str):
-            import json
-            try:
-                arr = json.loads(script_json_str)
-            except Exception:
-                return script_json_str  # If not valid JSON, return as is
-            new_arr = []
-            last_scene = None
-            for obj in arr:
-                scene_id = obj.get("scene_id") or obj.get("scene_title")
-                if scene_id and (scene_id.lower().startswith("choice") or obj.get("post_scene_choice_prompt")) and not obj.get("visual"):
-                    # This is a stray choice_point node, merge into last_scene
-                    if last_scene is not None:
-                        last_scene.update({
-                            k: v for k, v in obj.items() if k.startswith("option_") or k == "post_scene_choice_prompt"
-                        })
-                else:
-                    new_arr.append(obj)
-                    last_scene = obj
-            return json.dumps(new_arr, ensure_ascii=False)
-
-        script_text = fix_choice_points(script_text)
-        return script_text
 
-    except Exception as e:
-        raise RuntimeError(f"Gemini structured script generation failed: {str(e)}")
-
-
-def call_genkit_script_generation(config: dict, flow: dict) -> str:
+# --- POST-PROCESSING: Remove any stray choice_point nodes and embed their data into the preceding scene ---
+def fix_choice_points(script_json_str):
+    try:
+        arr = jsoncodec.loads(script_json_str)
+    except Exception:
+        return script_json_str  # If not valid JSON, return as is
+    new_arr = []
+    last_scene = None
+    for obj in arr:
+        scene_id = obj.get("scene_id") or obj.get("scene_title")
+        if scene_id and (scene_id.lower().startswith("choice") or obj.get("post_scene_choice_prompt")) and not obj.get("visual"):
+            # This is a stray choice_point node, merge into last_scene
+            if last_scene is not None:
+                last_scene.update({
+                    k: v for k, v in obj.items() if k.startswith("option_") or k == "post_scene_choice_prompt"
+                })
+        else:
+            new_arr.append(obj)
+            last_scene = obj
+    return jsoncodec.dumps(new_arr)
+
+
+def call_genkit_script_generation(config: dict, flow: dict, variant_hint: str = "") -> str:
     """
     Wrapper for Django views to invoke Gemini structured script generation.
     """
-    return generate_structured_ad_script(config, flow)
+    return generate_structured_ad_script(config, flow, variant_hint)
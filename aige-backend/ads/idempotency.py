@@ -0,0 +1,125 @@
+"""
+Idempotency keys and single-flight coalescing for expensive POSTs.
+
+Both use the same cache protocol, which works across worker processes when CACHES is
+shared (Redis):
+- ``cache.add`` on ``<key>:lock`` elects one leader that does the work.
+- The leader stores its successful response under ``<key>:result``.
+- Everyone else with the same key polls for that result instead of redoing the work.
+
+With an ``Idempotency-Key`` header the key is (user, header) and the result is replayed
+for AIGE_IDEMPOTENCY_TTL. Without one, the key is (user, request fingerprint) and only
+requests that arrive while the leader is running share its result: it is stored under
+the leader's lock token, which later requests never see, so sending the same request
+again after it finished (a deliberate "regenerate") runs again.
+Only 2xx responses are stored; after an error the next attempt runs again.
+"""
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class InFlight(Exception):
+    """
+    The leader for this key did not finish within the wait timeout.
+    """
+
+
+class KeyReused(Exception):
+    """
+    The Idempotency-Key was already used with a different request body.
+    """
+
+
+def fingerprint(data):
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def single_flight(key, request_fingerprint, compute, result_ttl, wait_timeout=None, replay=True):
+    """
+    Returns ``(status, data, replayed)``. ``compute`` returns ``(status, data)`` and runs
+    at most once at a time per ``key``. Concurrent callers get the leader's result; with
+    ``replay`` later callers get it too, for ``result_ttl`` seconds.
+    """
+    lock_key = f"{key}:lock"
+    wait_timeout = settings.AIGE_IDEMPOTENCY_WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+    deadline = time.monotonic() + wait_timeout
+    delay = 0.02
+    leader_token = None  # without replay, the lock holder whose result we wait for
+    while True:
+        if replay:
+            result_key = f"{key}:result"
+        else:
+            result_key = f"{key}:result:{leader_token}" if leader_token else None
+        stored = cache.get(result_key) if result_key else None
+        if stored is not None:
+            if stored["fingerprint"] != request_fingerprint:
+                raise KeyReused()
+            return stored["status"], stored["data"], True
+
+        token = f"{uuid.uuid4().hex}:{request_fingerprint}"
+        if cache.add(lock_key, token, settings.AIGE_IDEMPOTENCY_LOCK_TTL):
+            try:
+                # The previous leader may have stored its result and unlocked since we looked
+                if replay and cache.get(result_key) is not None:
+                    continue
+                status, data = compute()
+                if 200 <= status < 300:
+                    own_key = result_key if replay else f"{key}:result:{token}"
+                    cache.set(own_key, {"fingerprint": request_fingerprint, "status": status, "data": data}, result_ttl)
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+            return status, data, False
+
+        holder = cache.get(lock_key)
+        if holder is not None:
+            if not holder.endswith(f":{request_fingerprint}"):
+                raise KeyReused()
+            if not replay:
+                leader_token = holder
+        if time.monotonic() >= deadline:
+            raise InFlight()
+        # Either the leader is still working or it just failed; poll, then try to lead
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def coalesced_response(request, payload, compute):
+    """
+    Runs ``compute`` (returning a DRF Response) under the request's Idempotency-Key, or
+    coalesced with identical in-flight requests from the same user when there is none.
+    """
+    request_fingerprint = fingerprint(payload)
+    header = request.headers.get("Idempotency-Key")
+    if header:
+        digest = hashlib.sha256(header.encode("utf-8")).hexdigest()[:32]
+        key, ttl = f"ads:idem:{request.user.id}:{digest}", settings.AIGE_IDEMPOTENCY_TTL
+    else:
+        key, ttl = f"ads:flight:{request.user.id}:{request_fingerprint}", settings.AIGE_COALESCE_RESULT_TTL
+    replay = bool(header)
+
+    leader = {}
+
+    def run():
+        response = leader["response"] = compute()
+        return response.status_code, response.data
+
+    try:
+        status, data, replayed = single_flight(key, request_fingerprint, run, ttl, replay=replay)
+    except KeyReused:
+        return Response({"error": "Idempotency-Key was already used with a different request"}, status=422)
+    except InFlight:
+        return Response({"error": "An identical request is still in progress"}, status=409, headers={"Retry-After": "1"})
+
+    if replayed:
+        return Response(data, status=status, headers={REPLAY_HEADER: "true"})
+    return leader["response"]
@@ -0,0 +1,79 @@
+"""
+Pluggable JSON codec used by the DRF renderer/parser and the generation pipeline.
+
+Uses orjson when installed, then msgspec, then the stdlib ``json`` module. Output is
+always compact UTF-8 (the equivalent of ``ensure_ascii=False``). Set
+AIGE_JSON_BACKEND=json to force the stdlib implementation.
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _pick_backend():
+    requested = os.getenv("AIGE_JSON_BACKEND", "").lower()
+    available = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+    if requested and available.get(requested):
+        return requested
+    for name in ("orjson", "msgspec", "json"):
+        if available[name]:
+            return name
+
+
+BACKEND = _pick_backend()
+
+if BACKEND == "msgspec":
+    _msgspec_decoder = msgspec.json.Decoder()
+
+
+def _stdlib_dumps_bytes(obj, default=None):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def dumps_bytes(obj, default=None):
+    """
+    Serialises ``obj`` to UTF-8 encoded JSON bytes. ``default`` is called for objects the
+    backend cannot serialise natively, like ``json.dumps(default=...)``.
+    """
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers wider than 64 bits; stdlib handles them
+            return _stdlib_dumps_bytes(obj, default)
+    if BACKEND == "msgspec":
+        try:
+            return msgspec.json.encode(obj, enc_hook=default)
+        except (TypeError, OverflowError):
+            return _stdlib_dumps_bytes(obj, default)
+    return _stdlib_dumps_bytes(obj, default)
+
+
+def dumps(obj, default=None):
+    """
+    Serialises ``obj`` to a JSON ``str``.
+    """
+    return dumps_bytes(obj, default).decode("utf-8")
+
+
+def loads(data):
+    """
+    Parses JSON from ``str`` or ``bytes``. Raises ValueError on invalid input.
+    """
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if BACKEND == "msgspec":
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(data)
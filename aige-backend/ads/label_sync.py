@@ -0,0 +1,139 @@
+"""
+Copies the choice text of a generated script back onto the flow's choice nodes.
+
+The model rewrites each branching scene's ``post_scene_choice_prompt`` and
+``option_a_text``/``option_b_text``; the editor shows them as the choice node's
+``data.description`` and ``data.options[0/1].label``. The sync is one pass over the
+nodes and edges (the same index preprocess_flow_for_script uses) plus one pass over
+the script, and it yields only the choice nodes whose text actually changes.
+"""
+import logging
+
+from django.db import transaction
+
+from . import jsoncodec
+from .flow_preprocess import SCENE_TYPES, build_flow_index, choice_after, node_type
+from .models import AdConfiguration
+
+logger = logging.getLogger(__name__)
+
+
+def _script_scenes(script):
+    if isinstance(script, str):
+        try:
+            script = jsoncodec.loads(script)
+        except Exception:
+            return []
+    return [scene for scene in script if isinstance(scene, dict)] if isinstance(script, list) else []
+
+
+def _choice_text(choice):
+    data = choice.get('data') or {}
+    options = data.get('options') or []
+    if len(options) < 2:
+        return None
+    return {'description': data.get('description'), 'options': [options[0].get('label'), options[1].get('label')]}
+
+
+def choice_label_updates(script, flow):
+    """
+    Returns {choice_node_id: {"description": ..., "options": [label_a, label_b]}} for
+    the choice nodes whose text differs from the script's.
+
+    Script scenes are matched to flow scenes by ``scene_id`` (node id or title, as the
+    prompt asks the model to copy). Scenes whose id matches nothing, or whose choice an
+    earlier scene already claimed, are skipped rather than guessed.
+    """
+    if not isinstance(flow, dict):
+        return {}
+    nodes = flow.get('nodes') or []
+    node_by_id, outgoing = build_flow_index(nodes, flow.get('edges') or [])
+
+    scene_ids = {}
+    for node in nodes:
+        if node_type(node) in SCENE_TYPES:
+            node_id = str(node.get('id'))
+            scene_ids.setdefault(node_id, node_id)
+            title = (node.get('data') or {}).get('title')
+            if title:
+                scene_ids.setdefault(str(title), node_id)
+
+    updates = {}
+    claimed = set()
+    for scene in _script_scenes(script):
+        if not (scene.get('option_a_text') and scene.get('option_b_text')):
+            continue
+        node_id = scene_ids.get(str(scene.get('scene_id') or scene.get('scene_title') or ''))
+        choice = choice_after(node_id, node_by_id, outgoing) if node_id else None
+        if choice is None or str(choice.get('id')) in claimed:
+            continue
+        choice_id = str(choice.get('id'))
+        claimed.add(choice_id)
+        current = _choice_text(choice)
+        if current is None:
+            continue
+        wanted = {
+            'description': scene.get('post_scene_choice_prompt') or current['description'],
+            'options': [scene['option_a_text'], scene['option_b_text']],
+        }
+        if wanted != current:
+            updates[choice_id] = wanted
+    return updates
+
+
+def apply_label_updates(nodes, updates):
+    """
+    Returns ``(nodes, changed_ids)``. Changed nodes are copied with the new text; every
+    other node is the original object, and ``nodes`` itself comes back unchanged when
+    nothing differs.
+    """
+    if not updates:
+        return nodes, []
+    result = []
+    changed = []
+    for node in nodes:
+        node_id = str(node.get('id'))
+        update = updates.get(node_id)
+        current = _choice_text(node) if update else None
+        if current is None or current == update:
+            result.append(node)
+            continue
+        data = node.get('data') or {}
+        options = data['options']
+        result.append(dict(node, data=dict(
+            data,
+            description=update['description'],
+            options=[dict(options[0], label=update['options'][0]),
+                     dict(options[1], label=update['options'][1]), *options[2:]],
+        )))
+        changed.append(node_id)
+    return (result, changed) if changed else (nodes, [])
+
+
+def sync_config_labels(user_id, config_id, flow, script):
+    """
+    Applies the script's choice text to the user's stored AdConfiguration ``config_id``
+    and returns the updates. The row is locked and re-read so concurrent edits to other
+    nodes aren't lost, and it is only written when a stored node changes.
+    """
+    updates = choice_label_updates(script, flow)
+    if not updates or not config_id:
+        return updates
+    try:
+        config_id = int(config_id)
+    except (TypeError, ValueError):
+        return updates
+    with transaction.atomic():
+        config = (
+            AdConfiguration.objects.select_for_update().only('id', 'user_id', 'nodes')
+            .filter(pk=config_id, user_id=user_id).first()
+        )
+        if config is None:
+            return updates
+        nodes, changed = apply_label_updates(config.nodes or [], updates)
+        if changed:
+            config.nodes = nodes
+            # post_save also invalidates the cached config reads
+            config.save(update_fields=['nodes', 'updated_at'])
+            logger.debug("Synced choice labels of %d nodes into config %s", len(changed), config_id)
+    return updates
@@ -0,0 +1,62 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from ads.benchmarks import compare_to_baseline, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Runs the offline script generation benchmarks against a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake model latency per call")
+        parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Fake model output throughput (0 = instant)")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--db-writes", type=int, default=200)
+        parser.add_argument("--preprocess-sizes", default="10,100,1000,5000", help="Comma separated flow sizes")
+        parser.add_argument("--output", help="Write JSON results to this file")
+        parser.add_argument("--baseline", help="Fail if results regress against this JSON file")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+        parser.add_argument("--keepdb", action="store_true", help="Reuse the test database between runs")
+
+    def handle(self, *args, **options):
+        sizes = tuple(int(s) for s in options["preprocess_sizes"].split(",") if s.strip())
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            user, _ = User.objects.get_or_create(username="bench-user")
+            results = run_benchmarks(
+                user,
+                latency_ms=options["latency_ms"],
+                tokens_per_second=options["tokens_per_second"],
+                iterations=options["iterations"],
+                concurrency=options["concurrency"],
+                preprocess_sizes=sizes,
+                db_writes=options["db_writes"],
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output + "\n")
+        self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as fh:
+                baseline = json.load(fh)
+            regressions = compare_to_baseline(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Benchmark regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
@@ -0,0 +1,31 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ads.bulk import export_ndjson
+
+
+class Command(BaseCommand):
+    help = "Streams a user's scenes and ad configurations as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Output file, or - for stdout")
+        parser.add_argument("--user", required=True)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+
+        out = sys.stdout.buffer if options["path"] == "-" else open(options["path"], "wb")
+        try:
+            for line in export_ndjson(user, chunk_size=options["chunk_size"]):
+                out.write(line)
+        finally:
+            if out is sys.stdout.buffer:
+                out.flush()
+            else:
+                out.close()
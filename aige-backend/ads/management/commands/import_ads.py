@@ -0,0 +1,36 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ads.bulk import DEFAULT_BATCH_SIZE, BulkImportError, import_ndjson
+
+
+class Command(BaseCommand):
+    help = "Bulk imports scenes and ad configurations for a user from an NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, or - for stdin")
+        parser.add_argument("--user", required=True, help="Username that will own the imported rows")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+
+        stream = sys.stdin.buffer if options["path"] == "-" else open(options["path"], "rb")
+        try:
+            result = import_ndjson(stream, user, batch_size=options["batch_size"])
+        except BulkImportError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['scenes']} scenes and {result['configs']} configs for {user.username}."
+        ))
+        if result["unresolved_refs"]:
+            self.stderr.write(f"Unresolved scene refs: {', '.join(result['unresolved_refs'])}")
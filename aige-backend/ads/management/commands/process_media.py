@@ -0,0 +1,44 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ads.models import MediaAsset
+from ads.thumbnails import process_media_asset
+
+
+class Command(BaseCommand):
+    help = "Extracts video previews for assets whose background job never finished or failed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pending", action="store_true", help="Assets still pending (their job was lost)")
+        parser.add_argument("--failed", action="store_true", help="Assets whose extraction failed")
+        parser.add_argument("--min-age", type=int, default=600,
+                            help="Skip pending assets updated less than this many seconds ago (may be in progress)")
+        parser.add_argument("--workers", type=int, default=1, help="ffmpeg jobs to run at once")
+
+    def handle(self, *args, **options):
+        if not (options["pending"] or options["failed"]):
+            raise CommandError("Pass --pending and/or --failed")
+
+        ids = []
+        if options["pending"]:
+            cutoff = timezone.now() - datetime.timedelta(seconds=options["min_age"])
+            ids += MediaAsset.objects.filter(
+                status=MediaAsset.STATUS_PENDING, updated_at__lte=cutoff,
+            ).values_list("pk", flat=True)
+        if options["failed"]:
+            ids += MediaAsset.objects.filter(status=MediaAsset.STATUS_FAILED).values_list("pk", flat=True)
+
+        if options["workers"] > 1:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                assets = list(pool.map(process_media_asset, ids))
+        else:
+            assets = [process_media_asset(pk) for pk in ids]
+
+        by_status = {}
+        for asset in assets:
+            by_status[asset.status] = by_status.get(asset.status, 0) + 1
+        summary = ", ".join(f"{n} {status}" for status, n in sorted(by_status.items())) or "nothing to do"
+        self.stdout.write(f"Processed {len(assets)} assets: {summary}")
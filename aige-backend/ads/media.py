@@ -0,0 +1,176 @@
+"""
+Production media serving: byte ranges, conditional requests, signed URLs and
+optional offload to the front-end web server.
+
+Without offload, range responses keep the file descriptor positioned at the range
+start and set an exact Content-Length, so WSGI servers that implement
+``wsgi.file_wrapper`` with ``os.sendfile`` (gunicorn) stream the bytes zero-copy.
+"""
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.signing import Signer
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, parse_etags
+from django.utils._os import safe_join
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_signer = Signer(salt="ads.media")
+
+
+def _signature_payload(path, user_id, expires):
+    return f"{path}|{user_id}|{expires}"
+
+
+def signed_media_url(path, user_id, expires_in=None):
+    """
+    Returns MEDIA_URL + path with a signature that ties it to ``user_id`` and expires
+    after ``expires_in`` seconds (AIGE_MEDIA_URL_TTL by default).
+    """
+    expires = int(time.time()) + (expires_in or settings.AIGE_MEDIA_URL_TTL)
+    sig = _signer.signature(_signature_payload(path, user_id, expires))
+    return f"{settings.MEDIA_URL}{quote(path)}?u={user_id}&exp={expires}&sig={sig}"
+
+
+def verify_signature(request, path):
+    try:
+        user_id = request.GET["u"]
+        expires = int(request.GET["exp"])
+        sig = request.GET["sig"]
+    except (KeyError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return constant_time_compare(sig, _signer.signature(_signature_payload(path, user_id, expires)))
+
+
+class RangeFile:
+    """
+    File-like view of ``length`` bytes of ``fileobj`` starting at its current position.
+    Exposes ``fileno`` so sendfile-capable servers can skip the userspace copy.
+    """
+
+    def __init__(self, fileobj, length):
+        self._file = fileobj
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def parse_range(header, size):
+    """
+    Parses a single ``bytes=`` range. Returns (start, end) inclusive, None when the
+    header should be ignored (absent, malformed or multi-range) and raises ValueError
+    when it is unsatisfiable.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def serve_media(request, path):
+    """
+    Serves a file from MEDIA_ROOT with Range/206, ETag and Last-Modified support.
+    When AIGE_MEDIA_REQUIRE_SIGNATURE is on, the URL must come from signed_media_url.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponse(status=405, headers={"Allow": "GET, HEAD"})
+    if settings.AIGE_MEDIA_REQUIRE_SIGNATURE and not verify_signature(request, path):
+        return HttpResponseForbidden("Missing, invalid or expired media signature")
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404()
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404()
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    etag = _etag(stat)
+    last_modified = int(stat.st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    size = stat.st_size
+    byte_range = None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    # A stale If-Range (the client's copy changed) means "send the whole file"
+    if size and (not if_range or etag in parse_etags(if_range) or if_range == http_date(last_modified)):
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+    start, end = byte_range if byte_range else (0, size - 1)
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    if settings.AIGE_MEDIA_ACCEL_REDIRECT:
+        # nginx serves the bytes (and handles Range itself) from an internal location
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.AIGE_MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + quote(path)
+    elif settings.AIGE_MEDIA_X_SENDFILE:
+        # Apache mod_xsendfile / lighttpd
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+    else:
+        if request.method == "HEAD":
+            response = HttpResponse(content_type=content_type)
+        else:
+            fh = open(full_path, "rb")
+            fh.seek(start)
+            response = FileResponse(RangeFile(fh, end - start + 1), content_type=content_type)
+        response["Content-Length"] = str(end - start + 1)
+        if byte_range:
+            response.status_code = 206
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = f"private, max-age={settings.AIGE_MEDIA_MAX_AGE}"
+    return response
@@ -0,0 +1,137 @@
+"""
+Minimal in-process metrics registry with Prometheus text exposition.
+
+Values are per worker process; scrape each worker (or run a single worker) if you
+need exact totals. Other modules can add point-in-time values with
+``register_collector``.
+"""
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+_collectors = []
+
+
+def _key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def inc(name, amount=1, labels=None, help_text=""):
+    """
+    Increments a counter.
+    """
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0) + amount
+        if help_text:
+            _help.setdefault(name, help_text)
+
+
+def observe(name, value, labels=None, help_text="", buckets=DEFAULT_BUCKETS):
+    """
+    Records ``value`` (in seconds for durations) into a histogram.
+    """
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _key(labels)
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+        if help_text:
+            _help.setdefault(name, help_text)
+
+
+def register_collector(fn):
+    """
+    Registers a callable returning ``[(name, type, help, [(labels, value), ...]), ...]``
+    that is evaluated at scrape time. Useful for gauges such as pool or cache stats.
+    """
+    if fn not in _collectors:
+        _collectors.append(fn)
+    return fn
+
+
+def reset():
+    """
+    Clears all recorded values (used by tests).
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        value = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render():
+    """
+    Renders all metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(_histograms.items()):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in series.items():
+                for bound, count in zip(hist["buckets"], hist["counts"]):
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {hist['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {hist['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {hist['count']}")
+    for collector in list(_collectors):
+        for name, metric_type, help_text, samples in collector():
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(_key(labels))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _scrape_allowed(request):
+    token = settings.AIGE_METRICS_TOKEN
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if token and scheme.lower() == "bearer" and constant_time_compare(credentials.strip(), token):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_active and user.is_staff)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, for ``Authorization: Bearer <AIGE_METRICS_TOKEN>`` or a
+    staff session (per-view timings and query counts are not for everyone).
+    """
+    if not _scrape_allowed(request):
+        response = HttpResponse("Forbidden", status=403, content_type="text/plain")
+        response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,216 @@
+import hashlib
+import os
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import cc_delim_re, patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+from . import metrics
+from .profiling import start_profile, stop_profile
+
+
+class _SampledProfiler:
+    """
+    Prefers pyinstrument when installed, falls back to cProfile.
+    """
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            self.kind, self.profiler = "pyinstrument", Profiler()
+        except ImportError:
+            import cProfile
+            self.kind, self.profiler = "cprofile", cProfile.Profile()
+
+    def start(self):
+        if self.kind == "cprofile":
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self):
+        if self.kind == "cprofile":
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def dump(self, base_path):
+        if self.kind == "cprofile":
+            self.profiler.dump_stats(base_path + ".prof")
+        else:
+            with open(base_path + ".html", "w") as fh:
+                fh.write(self.profiler.output_html())
+
+
+class RequestProfilingMiddleware:
+    """
+    Opt-in (AIGE_PROFILING=1) request instrumentation:
+    - per-stage spans and DB query count/time exported as a Server-Timing header
+    - Prometheus histograms/counters served from /metrics
+    - sampled cProfile/pyinstrument dumps for requests slower than AIGE_PROFILING_SLOW_MS
+
+    When disabled the middleware removes itself from the chain at startup.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "AIGE_PROFILING", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "AIGE_PROFILING_SAMPLE_RATE", 0.0)
+        self.slow_seconds = getattr(settings, "AIGE_PROFILING_SLOW_MS", 1000.0) / 1000.0
+        self.dump_dir = getattr(settings, "AIGE_PROFILING_DIR", None)
+
+    def __call__(self, request):
+        profile, token = start_profile()
+        profiler = None
+        if self.sample_rate and self.dump_dir and random.random() < self.sample_rate:
+            profiler = _SampledProfiler()
+            profiler.start()
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(profile.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            stop_profile(token)
+            if profiler is not None:
+                profiler.stop()
+
+        route = self._route(request)
+        labels = {"method": request.method, "route": route, "status": response.status_code}
+        metrics.observe("aige_request_duration_seconds", elapsed, labels,
+                        "End-to-end request duration.")
+        metrics.inc("aige_db_queries_total", profile.query_count, {"route": route},
+                    "Database queries issued by requests.")
+        metrics.observe("aige_db_query_duration_seconds", profile.query_time, {"route": route},
+                        "Total time per request spent in database queries.")
+        totals = profile.span_totals()
+        for name, seconds in totals.items():
+            metrics.observe("aige_span_duration_seconds", seconds, {"route": route, "span": name},
+                            "Time spent in instrumented stages.")
+
+        timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items()]
+        timings.append(f'db;dur={profile.query_time * 1000:.2f};desc="{profile.query_count} queries"')
+        timings.append(f"total;dur={elapsed * 1000:.2f}")
+        response["Server-Timing"] = ", ".join(timings)
+
+        if profiler is not None and elapsed >= self.slow_seconds:
+            self._dump(profiler, request, elapsed)
+        return response
+
+    @staticmethod
+    def _route(request):
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.route:
+            return match.route
+        return "unmatched"
+
+    def _dump(self, profiler, request, elapsed):
+        os.makedirs(self.dump_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_") or "root"
+        base = os.path.join(self.dump_dir, f"{int(time.time() * 1000)}-{request.method}-{slug}-{int(elapsed * 1000)}ms")
+        profiler.dump(base)
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+class CompressionMiddleware:
+    """
+    Brotli (when installed) or gzip compression for large responses. Responses carrying
+    an ETag are immutable for that ETag, Content-Type and the request headers they Vary
+    on, so their compressed bytes are cached and reused until the object changes.
+    Paths in AIGE_COMPRESS_EXCLUDE_PATHS (responses with secrets in them) are never
+    compressed, which keeps them out of BREACH-style length oracles.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, "AIGE_COMPRESS_MIN_BYTES", 1024)
+        self.cache_ttl = getattr(settings, "AIGE_COMPRESS_CACHE_TTL", 3600)
+        self.exclude_paths = tuple(getattr(settings, "AIGE_COMPRESS_EXCLUDE_PATHS", ()))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.status_code != 200
+            or response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            or request.path.startswith(self.exclude_paths)
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < self.min_bytes:
+            return response
+
+        encoding = self._choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        etag = response.get("ETag")
+        key = None
+        compressed = None
+        if etag:
+            key = self._cache_key(request, response, etag, encoding)
+            compressed = cache.get(key) if key else None
+        if compressed is None:
+            compressed = self._compress(response.content, encoding)
+            if key is not None:
+                cache.set(key, compressed, self.cache_ttl)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        if etag and not etag.startswith("W/"):
+            # The body is no longer byte-identical to the uncompressed representation
+            response["ETag"] = "W/" + etag
+        return response
+
+    @staticmethod
+    def _cache_key(request, response, etag, encoding):
+        """
+        The version ETag is shared by every representation of an object (JSON, the
+        browsable API's HTML with its CSRF token, ...), so the key also covers the
+        Content-Type and the values of the request headers the response varies on.
+        """
+        vary = [header.strip() for header in cc_delim_re.split(response.get("Vary", "")) if header.strip()]
+        if "*" in vary:
+            return None
+        varied = [request.META.get("HTTP_" + header.upper().replace("-", "_"), "") for header in sorted(vary)]
+        parts = [request.get_full_path(), etag, response["Content-Type"], *varied]
+        digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+        return f"ads:compressed:{encoding}:{digest}"
+
+    @staticmethod
+    def _choose_encoding(accept_encoding):
+        accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def _compress(content, encoding):
+        if encoding == "br":
+            return brotli.compress(content, quality=5)
+        return compress_string(content)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0011_alter_adconfiguration_edges_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adconfiguration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='scene',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
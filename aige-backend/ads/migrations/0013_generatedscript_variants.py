@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0012_scene_adconfiguration_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedscript',
+            name='score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedscript',
+            name='variant_group',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedscript',
+            name='variant_rank',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
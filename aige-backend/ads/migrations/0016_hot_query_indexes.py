@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking writes on existing tables
+    atomic = False
+
+    dependencies = [
+        ('ads', '0015_usageledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='adconfiguration',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='adconfig_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='adconfiguration',
+            index=models.Index(fields=['user', 'updated_at'], include=('id',), name='adconfig_user_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='adconfiguration',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nodes'], name='adconfig_nodes_gin', opclasses=['jsonb_path_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='adconfiguration',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['edges'], name='adconfig_edges_gin', opclasses=['jsonb_path_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='generatedscript',
+            index=models.Index(fields=['user', '-created_at'], name='genscript_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='generatedscript',
+            index=models.Index(fields=['-created_at', '-id'], name='genscript_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='scene',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='scene_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='scene',
+            index=models.Index(fields=['user', 'updated_at'], include=('id',), name='scene_user_updated_idx'),
+        ),
+        # The composite indexes above lead with user_id; drop the single-column FK indexes
+        migrations.AlterField(
+            model_name='adconfiguration',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='generatedscript',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='scene',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
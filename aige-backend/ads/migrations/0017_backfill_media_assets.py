@@ -0,0 +1,41 @@
+"""
+Creates MediaAsset rows for videos uploaded before MediaAsset existed, so signing keeps
+working for them once ownership is decided by MediaAsset alone. Back then the uploader
+was the first user whose scene referenced the file, so the earliest scene decides.
+The rows start out pending; ``manage.py process_media --pending`` extracts their previews.
+"""
+import os
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.db import migrations
+
+
+def backfill_media_assets(apps, schema_editor):
+    Scene = apps.get_model('ads', 'Scene')
+    MediaAsset = apps.get_model('ads', 'MediaAsset')
+    known = set(MediaAsset.objects.values_list('url', flat=True))
+    new_assets = []
+    scenes = Scene.objects.order_by('created_at', 'id').values_list('user_id', 'video_url_a', 'video_url_b')
+    for user_id, *urls in scenes.iterator():
+        for url in urls:
+            path = urlparse(url).path if url else ''
+            if not path.startswith(settings.MEDIA_URL) or path in known:
+                continue
+            relative = unquote(path[len(settings.MEDIA_URL):])
+            if not os.path.isfile(os.path.join(settings.MEDIA_ROOT, relative)):
+                continue
+            known.add(path)
+            new_assets.append(MediaAsset(user_id=user_id, path=relative, url=path))
+    MediaAsset.objects.bulk_create(new_assets, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0016_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_media_assets, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
 
 class Scene(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # ✅ Added
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # ✅ Added
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
 
@@ -15,12 +16,22 @@ class Scene(models.Model):
     next_scene_b = models.ForeignKey('self', null=True, blank=True, related_name='next_from_b', on_delete=models.SET_NULL)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # The composite indexes lead with user_id, so the FK needs no index of its own
+        indexes = [
+            # List pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='scene_user_created_idx'),
+            # List ETags: COUNT(id), MAX(updated_at) WHERE user_id = ? as an index-only scan
+            models.Index(fields=['user', 'updated_at'], include=['id'], name='scene_user_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 class AdConfiguration(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # ✅ Added
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # ✅ Added
     theme_prompt = models.TextField()
     tone = models.CharField(max_length=100)
     characters_or_elements = models.TextField(blank=True)
@@ -29,9 +40,19 @@ class AdConfiguration(models.Model):
     include_mini_game = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     nodes = models.JSONField(default=list, blank=True, null=True)
     edges = models.JSONField(default=list, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='adconfig_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], include=['id'], name='adconfig_user_updated_idx'),
+            # Containment lookups into the flow graph, e.g. nodes__contains=[{"id": ...}]
+            GinIndex(fields=['nodes'], opclasses=['jsonb_path_ops'], name='adconfig_nodes_gin'),
+            GinIndex(fields=['edges'], opclasses=['jsonb_path_ops'], name='adconfig_edges_gin'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s config"
 
@@ -46,11 +67,79 @@ class UserProfile(models.Model):
         return self.user.username
 
 class GeneratedScript(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     config = models.JSONField()
     flow = models.JSONField()
     script = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Set when the script is one of several candidates generated together (variants=N)
+    variant_group = models.UUIDField(null=True, blank=True, db_index=True)
+    variant_rank = models.PositiveSmallIntegerField(null=True, blank=True)
+    score = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='genscript_user_created_idx'),
+            # Admin changelist sorts all users' scripts by date
+            models.Index(fields=['-created_at', '-id'], name='genscript_created_idx'),
+        ]
+
     def __str__(self):
         return f"Script by {self.user.username} at {self.created_at}"
+
+class MediaAsset(models.Model):
+    """
+    An uploaded video plus the preview artifacts extracted from it in the background
+    (see ads.thumbnails).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_UNAVAILABLE = 'unavailable'  # ffmpeg not installed
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_UNAVAILABLE, 'Unavailable'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    path = models.CharField(max_length=500)  # relative to MEDIA_ROOT
+    url = models.CharField(max_length=500, db_index=True)  # what scenes store in video_url_a/b
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(blank=True)
+
+    duration = models.FloatField(null=True, blank=True)  # seconds
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    poster = models.CharField(max_length=500, blank=True)  # relative to MEDIA_ROOT
+    sprite = models.CharField(max_length=500, blank=True)
+    sprite_columns = models.PositiveSmallIntegerField(null=True, blank=True)
+    sprite_rows = models.PositiveSmallIntegerField(null=True, blank=True)
+    sprite_interval = models.FloatField(null=True, blank=True)  # seconds between sprite frames
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path
+
+class UsageLedger(models.Model):
+    """
+    Daily generation counts per quota subject ("user:<id>" or "org:<organization>").
+    Written in batches by ads.quotas; the live quota counters sit in the cache.
+    """
+    subject = models.CharField(max_length=300)
+    day = models.DateField()
+    requests = models.PositiveIntegerField(default=0)
+    generations = models.PositiveIntegerField(default=0)  # model calls; variants=N counts N
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subject', 'day'], name='usage_ledger_subject_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} {self.day}: {self.generations}"
@@ -0,0 +1,85 @@
+"""
+Request-level timing spans for the hot paths.
+
+``span("name")`` is a no-op unless RequestProfilingMiddleware has started a
+profile for the current request, so the spans can stay in the code permanently.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar("aige_request_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Collects span durations and DB query stats for a single request.
+    """
+
+    def __init__(self):
+        self.spans = []  # [(name, seconds), ...] in completion order
+        self.query_count = 0
+        self.query_time = 0.0
+
+    def add_span(self, name, seconds):
+        self.spans.append((name, seconds))
+
+    def span_totals(self):
+        totals = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_time += time.perf_counter() - start
+
+
+def current_profile():
+    return _current.get()
+
+
+def start_profile():
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def stop_profile(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """
+    Times the wrapped block and records it on the current request profile, if any.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.perf_counter() - start)
+
+
+class InstrumentedViewMixin:
+    """
+    Adds ``auth`` and ``parse`` spans to DRF views. DRF authenticates and parses lazily,
+    so the spans force both to happen up front where they can be measured.
+    """
+
+    def perform_authentication(self, request):
+        with span("auth"):
+            super().perform_authentication(request)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if _current.get() is not None:
+            with span("parse"):
+                request.data
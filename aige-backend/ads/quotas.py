@@ -0,0 +1,212 @@
+"""
+Daily generation quotas per user and per organization (UserProfile.organization).
+
+Admission uses counters in the shared cache (atomic ``incr``), seeded from the
+UsageLedger table the first time a subject is seen each day. Durable usage goes to the
+ledger in batches: increments accumulate in-process and are flushed every
+AIGE_USAGE_FLUSH_SECONDS or AIGE_USAGE_FLUSH_ROWS subjects, whichever comes first.
+AdsConfig.ready registers ``flush_usage`` with atexit so the last interval is kept when
+a worker exits.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UsageLedger, UserProfile
+
+logger = logging.getLogger(__name__)
+
+SCOPE_USER = "user"
+SCOPE_ORGANIZATION = "organization"
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, scope, limit, resets_at):
+        super().__init__(f"Daily {scope} generation quota of {limit} exceeded")
+        self.scope = scope
+        self.limit = limit
+        self.resets_at = resets_at
+
+
+def _organization_key(user_id):
+    return f"ads:org:{user_id}"
+
+
+def organization_for(user_id):
+    return cache.get_or_set(
+        _organization_key(user_id),
+        lambda: UserProfile.objects.filter(user_id=user_id).values_list("organization", flat=True).first() or "",
+        settings.AIGE_AUTH_CACHE_TTL,
+    )
+
+
+def forget_organization(user_id):
+    cache.delete(_organization_key(user_id))
+
+
+def tenant_for(user_id):
+    """
+    The scheduling tenant: the organization when the user has one, else the user.
+    """
+    organization = organization_for(user_id)
+    return f"org:{organization}" if organization else f"user:{user_id}"
+
+
+def _subjects(user_id):
+    """
+    [(scope, subject, daily_limit), ...]; a limit of 0 means unlimited.
+    """
+    subjects = [(SCOPE_USER, f"user:{user_id}", settings.AIGE_QUOTA_USER_DAILY)]
+    organization = organization_for(user_id)
+    if organization:
+        subjects.append((SCOPE_ORGANIZATION, f"org:{organization}", settings.AIGE_QUOTA_ORG_DAILY))
+    return subjects
+
+
+def _period():
+    day = timezone.now().date()
+    resets_at = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc)
+    return day, resets_at
+
+
+def _counter_key(subject, day):
+    return f"ads:quota:{subject}:{day.isoformat()}"
+
+
+def _used(subject, day):
+    key = _counter_key(subject, day)
+    used = cache.get(key)
+    if used is None:
+        stored = UsageLedger.objects.filter(subject=subject, day=day).values_list("generations", flat=True).first()
+        with _pending_lock:
+            pending = _pending.get((subject, day), [0, 0])[1]
+        # Two days so the counter outlives the period it counts
+        cache.add(key, (stored or 0) + pending, 2 * 24 * 3600)
+        used = cache.get(key, 0)
+    return used
+
+
+def _incr(subject, day, amount):
+    _used(subject, day)
+    try:
+        return cache.incr(_counter_key(subject, day), amount)
+    except ValueError:  # evicted between the seed and the increment
+        cache.add(_counter_key(subject, day), amount, 2 * 24 * 3600)
+        return amount
+
+
+class Reservation:
+    """
+    Generations charged against every quota of a user up front. ``settle`` refunds
+    whatever wasn't used and records the rest in the ledger.
+    """
+
+    def __init__(self, subjects, day, amount):
+        self.subjects = subjects
+        self.day = day
+        self.amount = amount
+        self._settled = False
+
+    def settle(self, used):
+        if self._settled:
+            return
+        self._settled = True
+        unused = self.amount - used
+        if unused > 0:
+            for subject in self.subjects:
+                cache.decr(_counter_key(subject, self.day), unused)
+        record_usage(self.subjects, self.day, generations=used)
+
+
+def reserve(user_id, amount=1):
+    """
+    Charges ``amount`` generations to the user's and organization's daily quotas.
+    Raises QuotaExceeded (charging nothing) when either would go over its limit.
+    """
+    day, resets_at = _period()
+    charged = []
+    for scope, subject, limit in _subjects(user_id):
+        total = _incr(subject, day, amount)
+        charged.append(subject)
+        if limit and total > limit:
+            for done in charged:
+                cache.decr(_counter_key(done, day), amount)
+            raise QuotaExceeded(scope, limit, resets_at)
+    return Reservation(charged, day, amount)
+
+
+def quota_status(user_id):
+    day, resets_at = _period()
+    quotas = []
+    for scope, subject, limit in _subjects(user_id):
+        used = _used(subject, day)
+        quotas.append({
+            "scope": scope,
+            "subject": subject,
+            "limit": limit or None,
+            "used": used,
+            "remaining": max(0, limit - used) if limit else None,
+        })
+    return {"period": "day", "resets_at": resets_at.isoformat(), "quotas": quotas}
+
+
+# ----------- USAGE LEDGER -----------
+_pending_lock = threading.Lock()
+_pending = {}  # (subject, day) -> [requests, generations]
+_last_flush = time.monotonic()
+
+
+def record_usage(subjects, day, generations, requests=1):
+    with _pending_lock:
+        for subject in subjects:
+            row = _pending.setdefault((subject, day), [0, 0])
+            row[0] += requests
+            row[1] += generations
+        due = (
+            len(_pending) >= settings.AIGE_USAGE_FLUSH_ROWS
+            or time.monotonic() - _last_flush >= settings.AIGE_USAGE_FLUSH_SECONDS
+        )
+    if due:
+        flush_usage()
+
+
+def flush_usage():
+    """
+    Writes pending increments to UsageLedger with one insert plus one F() update per
+    subject/day. Returns the number of rows touched.
+    """
+    global _pending, _last_flush
+    with _pending_lock:
+        batch, _pending = _pending, {}
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+    try:
+        with transaction.atomic():
+            UsageLedger.objects.bulk_create(
+                [UsageLedger(subject=subject, day=day) for subject, day in batch], ignore_conflicts=True,
+            )
+            now = timezone.now()
+            for (subject, day), (requests, generations) in batch.items():
+                UsageLedger.objects.filter(subject=subject, day=day).update(
+                    requests=F("requests") + requests,
+                    generations=F("generations") + generations,
+                    updated_at=now,
+                )
+    except Exception:
+        logger.exception("Flushing %d usage ledger rows failed; will retry", len(batch))
+        with _pending_lock:
+            for key, (requests, generations) in batch.items():
+                row = _pending.setdefault(key, [0, 0])
+                row[0] += requests
+                row[1] += generations
+        return 0
+    return len(batch)
+
@@ -0,0 +1,27 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from . import jsoncodec
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by ads.jsoncodec. Types the codec doesn't know natively
+    (Decimal, UUID, lazy strings, ...) go through DRF's own encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # Pretty printing (browsable API, ?indent=) keeps the stdlib path
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = jsoncodec.dumps_bytes(data, default=_drf_encoder.default)
+        # Same as JSONRenderer: escape separators that are invalid in JavaScript strings
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
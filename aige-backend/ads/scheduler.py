@@ -0,0 +1,191 @@
+"""
+Weighted fair queuing in front of the model calls.
+
+At most AIGE_GENERATION_CONCURRENCY model calls run at once per process. When all
+slots are busy, callers queue and are admitted in order of their virtual finish tag:
+each (priority, tenant) pair is its own flow, and a flow's tags advance by
+``cost / weight``, with weights from AIGE_PRIORITY_WEIGHTS. A tenant submitting a large
+batch therefore only delays its own later requests, and interactive requests overtake
+queued batch/speculative work.
+
+The current tenant and priority travel in a ContextVar (see ``generation_context``),
+so ``genkit_service`` needs no request plumbing and this module works without Django
+(genkit_server.py) using the defaults below.
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+SPECULATIVE = "speculative"
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 8, BATCH: 2, SPECULATIVE: 1}
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 120.0
+
+_current = ContextVar("aige_generation_class", default=("anonymous", INTERACTIVE))
+
+
+class SchedulerTimeout(Exception):
+    """
+    Raised when a request waited longer than the queue timeout for a model slot.
+    """
+
+
+@contextmanager
+def generation_context(tenant, priority=INTERACTIVE):
+    """
+    Runs the block (and anything copied from its context) as ``tenant``/``priority``.
+    """
+    token = _current.set((tenant, priority))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("event", "cancelled")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.cancelled = False
+
+
+class FairScheduler:
+    def __init__(self, capacity=DEFAULT_CONCURRENCY, weights=None, timeout=DEFAULT_TIMEOUT):
+        self.capacity = capacity
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._heap = []  # (finish_tag, seq, start_tag, priority, waiter)
+        self._finish = {}  # flow -> finish tag of its last admitted or queued request
+        self._virtual = 0.0
+        self._seq = itertools.count()
+        self._stats = {p: {"admitted": 0, "wait_seconds": 0.0, "timeouts": 0} for p in self.weights}
+
+    def _tags(self, flow, priority, cost):
+        start = max(self._virtual, self._finish.get(flow, 0.0))
+        finish = self._finish[flow] = start + cost / self.weights[priority]
+        if len(self._finish) > 4096:
+            # Flows at or behind virtual time are idle; forgetting them changes nothing
+            self._finish = {f: t for f, t in self._finish.items() if t > self._virtual}
+        return start, finish
+
+    def acquire(self, cost=1.0, timeout=None):
+        """
+        Takes one model slot, queueing fairly for it when all are busy. Tenant and
+        priority come from ``generation_context``. Pair with ``release``.
+        """
+        tenant, priority = _current.get()
+        self._acquire(tenant, priority, cost, self.timeout if timeout is None else timeout)
+
+    def _acquire(self, tenant, priority, cost, timeout):
+        if priority not in self.weights:
+            raise ValueError(f"Unknown priority {priority!r}")
+        started = time.monotonic()
+        with self._lock:
+            start, finish = self._tags((priority, tenant), priority, cost)
+            if self._active < self.capacity and not self._heap:
+                # Uncontended: virtual time follows the work in service, so usage while
+                # nobody was waiting isn't held against a flow later
+                self._virtual = max(self._virtual, start)
+                self._active += 1
+                self._record(priority, 0.0)
+                return
+            waiter = _Waiter()
+            heapq.heappush(self._heap, (finish, next(self._seq), start, priority, waiter))
+
+        admitted = waiter.event.wait(timeout)
+        with self._lock:
+            if not admitted and not waiter.event.is_set():
+                waiter.cancelled = True
+                self._stats[priority]["timeouts"] += 1
+                raise SchedulerTimeout(f"No model slot became available within {timeout:.0f}s")
+            self._record(priority, time.monotonic() - started)
+
+    def _record(self, priority, waited):
+        stats = self._stats[priority]
+        stats["admitted"] += 1
+        stats["wait_seconds"] += waited
+
+    def release(self):
+        with self._lock:
+            while self._heap:
+                _, _, start, _, waiter = heapq.heappop(self._heap)
+                if waiter.cancelled:
+                    continue
+                # Hand the slot straight to the next waiter
+                self._virtual = max(self._virtual, start)
+                waiter.event.set()
+                return
+            self._active -= 1
+
+    @contextmanager
+    def slot(self, cost=1.0, timeout=None):
+        """
+        Holds one model slot for the block.
+        """
+        self.acquire(cost, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            queued = {p: 0 for p in self.weights}
+            for _, _, _, priority, waiter in self._heap:
+                if not waiter.cancelled:
+                    queued[priority] += 1
+            return {
+                "capacity": self.capacity,
+                "active": self._active,
+                "queued": queued,
+                "by_priority": {p: dict(s) for p, s in self._stats.items()},
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    The per-process scheduler, configured from Django settings when they are available.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from django.conf import settings
+
+                capacity, weights, timeout = DEFAULT_CONCURRENCY, DEFAULT_WEIGHTS, DEFAULT_TIMEOUT
+                if settings.configured:
+                    capacity = getattr(settings, "AIGE_GENERATION_CONCURRENCY", capacity)
+                    weights = getattr(settings, "AIGE_PRIORITY_WEIGHTS", weights)
+                    timeout = getattr(settings, "AIGE_GENERATION_QUEUE_TIMEOUT", timeout)
+                _scheduler = FairScheduler(capacity, weights, timeout)
+    return _scheduler
+
+
+def collect_scheduler_metrics():
+    stats = get_scheduler().stats()
+    by_priority = stats["by_priority"]
+    return [
+        ("aige_generation_slots", "gauge", "Concurrent model calls allowed per process.", [({}, stats["capacity"])]),
+        ("aige_generation_active", "gauge", "Model calls currently running.", [({}, stats["active"])]),
+        ("aige_generation_queued", "gauge", "Requests waiting for a model slot.",
+         [({"priority": p}, n) for p, n in stats["queued"].items()]),
+        ("aige_generation_admitted_total", "counter", "Requests admitted to a model slot.",
+         [({"priority": p}, s["admitted"]) for p, s in by_priority.items()]),
+        ("aige_generation_wait_seconds_total", "counter", "Time spent queueing for a model slot.",
+         [({"priority": p}, s["wait_seconds"]) for p, s in by_priority.items()]),
+        ("aige_generation_queue_timeouts_total", "counter", "Requests that gave up waiting for a slot.",
+         [({"priority": p}, s["timeouts"]) for p, s in by_priority.items()]),
+    ]
@@ -1,16 +1,78 @@
+from urllib.parse import urlparse
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Scene, AdConfiguration, UserProfile, GeneratedScript
+from .models import Scene, AdConfiguration, UserProfile, GeneratedScript, MediaAsset
+from .thumbnails import THUMBS_DIR
+
+
+def _thumb_url(name):
+    return reverse('thumbnail', args=[name[len(THUMBS_DIR) + 1:]]) if name else None
+
+
+def media_preview(asset):
+    """
+    Compact preview payload for a MediaAsset (a few hundred bytes instead of the video).
+    """
+    if asset is None:
+        return None
+    return {
+        'status': asset.status,
+        'poster': _thumb_url(asset.poster),
+        'sprite': {
+            'url': _thumb_url(asset.sprite),
+            'columns': asset.sprite_columns,
+            'rows': asset.sprite_rows,
+            'interval': asset.sprite_interval,
+        } if asset.sprite else None,
+        'duration': asset.duration,
+        'width': asset.width,
+        'height': asset.height,
+    }
+
+
+def media_path(url):
+    return urlparse(url).path if url else ''
+
+
+def media_assets_for(scenes):
+    """
+    Maps media path -> MediaAsset for the videos referenced by ``scenes`` in one query.
+    """
+    paths = {media_path(url) for scene in scenes for url in (scene.video_url_a, scene.video_url_b) if url}
+    user_ids = {scene.user_id for scene in scenes}
+    if not paths:
+        return {}
+    assets = MediaAsset.objects.filter(user_id__in=user_ids, url__in=paths)
+    return {asset.url: asset for asset in assets}
+
 
 class SceneSerializer(serializers.ModelSerializer):
+    preview_a = serializers.SerializerMethodField()
+    preview_b = serializers.SerializerMethodField()
+
     class Meta:
         model = Scene
         fields = '__all__'
 
+    def _preview(self, scene, url):
+        if not url:
+            return None
+        assets = self.context.get('media_assets')
+        if assets is None:
+            assets = media_assets_for([scene])
+        return media_preview(assets.get(media_path(url)))
+
+    def get_preview_a(self, obj):
+        return self._preview(obj, obj.video_url_a)
+
+    def get_preview_b(self, obj):
+        return self._preview(obj, obj.video_url_b)
+
 class AdConfigurationSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     class Meta:
         model = AdConfiguration
-        fields = ['id', 'user', 'theme_prompt', 'tone', 'characters_or_elements', 'enable_ar_filters', 'include_mini_game', 'created_at', 'nodes', 'edges']
+        fields = ['id', 'user', 'theme_prompt', 'tone', 'characters_or_elements', 'enable_ar_filters', 'include_mini_game', 'created_at', 'updated_at', 'nodes', 'edges']
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
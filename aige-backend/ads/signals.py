@@ -1,11 +1,58 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.contrib.auth.models import User
+from django.db.models import Q
 from django.dispatch import receiver
-from .models import UserProfile
+from django.utils import timezone
+from .models import UserProfile, Scene, AdConfiguration, MediaAsset
+from .serializers import media_path
+from .authentication import invalidate_cached_user
+from . import caching
+from .quotas import forget_organization
 
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_or_update_user_profile(sender, instance, created, update_fields=None, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
-    else:
-        instance.userprofile.save()
+    # last_login is bumped on every token login; the cached copy doesn't need it
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_cached_user(instance.pk)
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_user_on_profile_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+    forget_organization(instance.user_id)
+
+@receiver([post_save, post_delete], sender=Scene)
+@receiver([post_save, post_delete], sender=AdConfiguration)
+def invalidate_read_cache(sender, instance, **kwargs):
+    caching.invalidate(sender._meta.label_lower, instance.user_id)
+
+def touch_scenes(pks):
+    """
+    Bumps updated_at (the ETag version) of scenes whose payload changed without a save.
+    """
+    if pks:
+        Scene.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+@receiver(pre_delete, sender=Scene)
+def touch_linking_scenes(sender, instance, **kwargs):
+    # SET_NULL clears next_scene_a/b with QuerySet.update(), which skips auto_now
+    linking = Scene.objects.filter(Q(next_scene_a=instance) | Q(next_scene_b=instance)).exclude(pk=instance.pk)
+    rows = list(linking.values_list('pk', 'user_id'))
+    touch_scenes([pk for pk, _ in rows])
+    for user_id in {user_id for _, user_id in rows} - {instance.user_id}:
+        caching.invalidate(Scene._meta.label_lower, user_id)
+
+@receiver([post_save, post_delete], sender=MediaAsset)
+def invalidate_scene_previews(sender, instance, **kwargs):
+    # Scene payloads embed preview data for their videos
+    candidates = Scene.objects.filter(user_id=instance.user_id).filter(
+        Q(video_url_a__contains=instance.url) | Q(video_url_b__contains=instance.url)
+    ).values_list('pk', 'video_url_a', 'video_url_b')
+    touch_scenes([pk for pk, url_a, url_b in candidates if instance.url in (media_path(url_a), media_path(url_b))])
+    caching.invalidate(Scene._meta.label_lower, instance.user_id)
@@ -1,10 +1,61 @@
+import datetime
+import gzip
+import http.client
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
 from unittest.mock import patch
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import genkit_service, jsoncodec, metrics, quotas
+from .authentication import user_cache_key
+from .benchmarks import compare_to_baseline, import_time_report, make_flow, percentiles, slowest_imports
+from .bulk import BulkImportError, export_ndjson, import_ndjson
+from .caching import cache_stats, reset_local_cache
+from .dbpool import collect_pool_metrics
 from .flow_preprocess import preprocess_flow_for_script
-from .genkit_service import generate_structured_ad_script, genai
+from .genkit_service import generate_structured_ad_script
+from .idempotency import single_flight
+from .label_sync import apply_label_updates, choice_label_updates
+from .media import parse_range
+from .models import AdConfiguration, GeneratedScript, MediaAsset, Scene, UsageLedger
+from .quotas import flush_usage
+from .renderers import FastJSONRenderer
+from .scheduler import BATCH, INTERACTIVE, FairScheduler, SchedulerTimeout, generation_context
+from .thumbnails import process_media_asset
+from .variants import score_script
 
 # Create your tests here.
 
+def reset_cached_state():
+    """
+    Cache keys embed user ids, which a fresh test database may hand out again, and
+    pending quota usage is per process, so tests touching either start from scratch.
+    """
+    cache.clear()
+    reset_local_cache()
+    with quotas._pending_lock:
+        quotas._pending.clear()
+
 class FlowPreprocessTests(unittest.TestCase):
     def test_preprocess_adds_node_type_and_merges_choice(self):
         flow = {
@@ -60,12 +111,799 @@ class ScriptGenerationTests(unittest.TestCase):
                 {'source': '5', 'target': '6'},
             ]
         }
-        # Patch the GenerativeModel class directly
-        with patch.object(genai, 'GenerativeModel') as mock_model:
+        # Patch the model factory so the SDK is never loaded
+        with patch.object(genkit_service, 'get_generative_model') as mock_model:
             mock_instance = mock_model.return_value
             mock_instance.generate_content.return_value.text = '[{"scene_id": "5", "visual": "Mini Game"}]'
             script = generate_structured_ad_script(config, flow)
             self.assertIn('Mini Game', script)
 
+class GenkitServerTests(unittest.TestCase):
+    def setUp(self):
+        import genkit_server
+        self.server_module = genkit_server
+        quiet = patch.object(genkit_server.GenerationHandler, 'log_message')
+        quiet.start()
+        self.addCleanup(quiet.stop)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), genkit_server.GenerationHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _post(self, body):
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        self.addCleanup(conn.close)
+        conn.request('POST', '/generate', body=jsoncodec.dumps(body), headers={'Content-Type': 'application/json'})
+        return conn.getresponse()
+
+    def test_non_object_body_is_400(self):
+        self.assertEqual(self._post([]).status, 400)
+
+    def test_scheduler_timeout_is_503(self):
+        with patch.object(self.server_module, 'generate_structured_ad_script', side_effect=SchedulerTimeout('busy')):
+            response = self._post({'config': {'characters_or_elements': 'Hero'}, 'flow': {'nodes': []}})
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader('Retry-After'), '5')
+
+class BenchmarkHelperTests(unittest.TestCase):
+    def test_make_flow_is_deterministic_and_preprocessable(self):
+        self.assertEqual(make_flow(20), make_flow(20))
+        processed = preprocess_flow_for_script(make_flow(20))
+        self.assertEqual(len(processed), 20)
+        self.assertEqual(processed[0]['option_a_leads_to'], 's1')
+
+    def test_compare_to_baseline_flags_regressions(self):
+        baseline = {'endpoint': percentiles([10.0, 20.0, 30.0]), 'concurrency': {'throughput_rps': 100.0}}
+        current = {'endpoint': percentiles([10.0, 20.0, 90.0]), 'concurrency': {'throughput_rps': 50.0}}
+        regressions = compare_to_baseline(current, baseline)
+        self.assertTrue(any(r.startswith('endpoint.max_ms') for r in regressions))
+        self.assertTrue(any(r.startswith('concurrency.throughput_rps') for r in regressions))
+        self.assertEqual(compare_to_baseline(baseline, baseline), [])
+
+class ImportTimeTests(unittest.TestCase):
+    # Only loaded when a script is actually generated (see genkit_service.get_genai)
+    LAZY_MODULES = ('google.genai', 'google.generativeai', 'google.ai.generativelanguage')
+    # Wall-clock time varies with the machine, so the budget only catches gross
+    # regressions (~15ms when measured; an eager SDK import took 500ms+)
+    URLCONF_BUDGET_MS = float(os.getenv('AIGE_URLCONF_IMPORT_BUDGET_MS', '2000'))
+
+    def test_urlconf_import_skips_the_sdk(self):
+        report = import_time_report('aige.urls')
+        self.assertIn('aige.urls', report['modules'])
+        for name in self.LAZY_MODULES:
+            self.assertNotIn(name, report['modules'], f"aige.urls imports {name}; slowest: {slowest_imports(report)}")
+        self.assertLess(report['module_ms'], self.URLCONF_BUDGET_MS,
+                        f"aige.urls took {report['module_ms']}ms to import; slowest: {slowest_imports(report)}")
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.user = User.objects.create_user(username='profiler', password='pw')
+        metrics.reset()
+
+    def _generate(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        payload = {'config': {'characters_or_elements': 'Hero'}, 'flow': {'nodes': [], 'edges': []}}
+        with patch.object(genkit_service, 'get_generative_model') as mock_model:
+            mock_model.return_value.generate_content.return_value.text = '[]'
+            return client.post('/api/generate-script/', payload, format='json')
+
+    @override_settings(AIGE_PROFILING=True)
+    def test_server_timing_and_metrics_when_enabled(self):
+        response = self._generate()
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for stage in ('auth', 'parse', 'preprocess', 'prompt', 'model', 'fix_choice_points', 'db_insert', 'db;', 'total'):
+            self.assertIn(stage, timing)
+        self.assertIn('aige_request_duration_seconds_count', metrics.render())
+
+    @override_settings(AIGE_METRICS_TOKEN='scrape-me')
+    def test_metrics_need_token_or_staff(self):
+        factory = RequestFactory()
+        anonymous = factory.get('/metrics')
+        anonymous.user = AnonymousUser()
+        self.assertEqual(metrics.metrics_view(anonymous).status_code, 403)
+        wrong = factory.get('/metrics', HTTP_AUTHORIZATION='Bearer nope')
+        wrong.user = self.user
+        self.assertEqual(metrics.metrics_view(wrong).status_code, 403)
+        scraper = factory.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        scraper.user = AnonymousUser()
+        self.assertEqual(metrics.metrics_view(scraper).status_code, 200)
+        staff = factory.get('/metrics')
+        staff.user = User.objects.create_user(username='ops', is_staff=True)
+        self.assertEqual(metrics.metrics_view(staff).status_code, 200)
+
+    @override_settings(AIGE_PROFILING=False)
+    def test_disabled_by_default(self):
+        response = self._generate()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.user = User.objects.create_user(username='cached', password='pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_second_request_skips_user_query(self):
+        self.assertEqual(self.client.get('/api/configs/').status_code, 200)
+        with self.assertNumQueries(0):  # user, ETag and list all come from the cache
+            self.assertEqual(self.client.get('/api/configs/').status_code, 200)
+
+    def test_user_and_profile_saves_invalidate_cache(self):
+        self.client.get('/api/configs/')
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        self.user.userprofile.organization = 'Acme'
+        self.user.userprofile.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+        self.client.get('/api/configs/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/configs/').status_code, 401)
+
+    @override_settings(AIGE_AUTH_LEAN_READS=True)
+    def test_lean_reads_use_token_user(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/configs/').status_code, 200)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.user = User.objects.create_user(username='etag', password='pw')
+        self.config = AdConfiguration.objects.create(
+            user=self.user, theme_prompt='t', tone='fun',
+            nodes=[{'id': str(i), 'type': 'scene', 'data': {'title': 'x' * 50}} for i in range(100)], edges=[])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_detail_304_until_object_changes(self):
+        url = f'/api/configs/{self.config.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):  # ETag is served from the read cache
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.config.tone = 'serious'
+        self.config.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_on_delete(self):
+        other = AdConfiguration.objects.create(user=self.user, theme_prompt='t', tone='fun')
+        etag = self.client.get('/api/configs/')['ETag']
+        self.assertEqual(self.client.get('/api/configs/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        other.delete()
+        self.assertEqual(self.client.get('/api/configs/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_scene_etag_changes_when_linked_scene_is_deleted(self):
+        target = Scene.objects.create(user=self.user, title='target')
+        scene = Scene.objects.create(user=self.user, title='from', next_scene_a=target)
+        url = f'/api/scenes/{scene.pk}/'
+        etag = self.client.get(url)['ETag']
+        target.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['next_scene_a'])
+
+    def test_large_responses_are_gzipped(self):
+        response = self.client.get(f'/api/configs/{self.config.pk}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_compressed_bodies_are_cached_per_representation(self):
+        url = f'/api/configs/{self.config.pk}/'
+        html = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_ACCEPT='text/html')
+        as_json = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_ACCEPT='application/json')
+        self.assertEqual(html['ETag'], as_json['ETag'])
+        self.assertTrue(html['Content-Type'].startswith('text/html'))
+        self.assertEqual(jsoncodec.loads(gzip.decompress(as_json.content))['id'], self.config.pk)
+
+    @override_settings(AIGE_COMPRESS_MIN_BYTES=1)
+    def test_token_responses_are_not_compressed(self):
+        response = APIClient().post('/api/token/', {'username': 'etag', 'password': 'pw'},
+                                    format='json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_unknown_pk_is_404(self):
+        self.assertEqual(self.client.get('/api/configs/nope/').status_code, 404)
+
+class JSONCodecTests(unittest.TestCase):
+    def test_roundtrip_is_compact_utf8(self):
+        data = {'title': 'Café', 'n': [1, 2.5, None, True]}
+        encoded = jsoncodec.dumps(data)
+        self.assertIn('Café', encoded)
+        self.assertNotIn(', ', encoded)
+        self.assertEqual(jsoncodec.loads(encoded), data)
+        self.assertEqual(jsoncodec.loads(encoded.encode('utf-8')), data)
+
+    def test_renderer_handles_drf_types_and_js_separators(self):
+        rendered = FastJSONRenderer().render({'price': Decimal('1.50'), 'text': 'a\u2028b'})
+        self.assertEqual(jsoncodec.loads(rendered)['price'], 1.5)
+        self.assertIn(b'\\u2028', rendered)
+
+class FastJSONParserTests(TestCase):
+    def test_invalid_json_is_400(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='parser'))
+        response = client.post('/api/configs/', data='{"tone": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+class ConnectionPoolMetricsTests(TestCase):
+    def test_pool_stats_exported_when_pooled(self):
+        if connection.vendor != 'postgresql' or connection.pool is None:
+            self.skipTest('database is not pooled')
+        User.objects.count()
+        names = {name for name, _, _, _ in collect_pool_metrics()}
+        self.assertIn('aige_db_pool_size', names)
+        self.assertIn('aige_db_pool_requests_wait_ms_total', names)
+        self.assertIn('aige_db_pool_size{alias="default"}', metrics.render())
+
+class BulkImportExportTests(TestCase):
+    LINES = [
+        '{"type": "scene", "ref": "intro", "title": "Intro", "next_scene_a": "left", "next_scene_b": "right"}',
+        '{"type": "scene", "ref": "left", "title": "Left", "next_scene_a": "intro"}',
+        '',
+        '{"type": "config", "ref": "c1", "theme_prompt": "Village", "tone": "warm", "nodes": [{"id": "1"}], "edges": []}',
+        '{"type": "scene", "ref": "right", "title": "Right", "next_scene_b": "missing"}',
+    ]
+
+    def setUp(self):
+        reset_cached_state()
+        self.user = User.objects.create_user(username='bulk')
+
+    def test_import_resolves_refs_across_batches(self):
+        result = import_ndjson(self.LINES, self.user, batch_size=1)
+        self.assertEqual((result['scenes'], result['configs']), (3, 1))
+        self.assertEqual(result['unresolved_refs'], ['missing'])
+        intro = Scene.objects.get(user=self.user, title='Intro')
+        self.assertEqual(intro.next_scene_a.title, 'Left')
+        self.assertEqual(intro.next_scene_b.title, 'Right')
+        self.assertEqual(intro.next_scene_a.next_scene_a, intro)
+
+    def test_export_roundtrips_into_another_account(self):
+        import_ndjson(self.LINES, self.user)
+        exported = list(export_ndjson(self.user))
+        self.assertEqual(len(exported), 4)
+        other = User.objects.create_user(username='bulk2')
+        result = import_ndjson(exported, other)
+        self.assertEqual(result['unresolved_refs'], [])
+        intro = Scene.objects.get(user=other, title='Intro')
+        self.assertEqual(intro.next_scene_b.user, other)
+        self.assertEqual(AdConfiguration.objects.get(user=other).nodes, [{'id': '1'}])
+
+    def test_bad_line_reports_line_number(self):
+        with self.assertRaises(BulkImportError) as ctx:
+            import_ndjson(['{"type": "scene", "title": "ok"}', '{"type": "widget"}'], self.user)
+        self.assertEqual(ctx.exception.line, 2)
+
+    def test_api_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/bulk/import/', data='\n'.join(self.LINES), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['scenes'], 3)
+        response = client.get('/api/bulk/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+
+class ReadCacheTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.user = User.objects.create_user(username='reader')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_and_detail_cached_until_write(self):
+        config = AdConfiguration.objects.create(user=self.user, theme_prompt='t', tone='fun')
+        self.client.get('/api/configs/')
+        self.client.get(f'/api/configs/{config.pk}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get('/api/configs/').data), 1)
+            self.assertEqual(self.client.get(f'/api/configs/{config.pk}/').data['tone'], 'fun')
+
+        response = self.client.patch(f'/api/configs/{config.pk}/', {'tone': 'serious'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/configs/{config.pk}/').data['tone'], 'serious')
+        self.assertEqual(self.client.get('/api/configs/').data[0]['tone'], 'serious')
+        stats = cache_stats()
+        self.assertGreater(stats['invalidations'], 0)
+        self.assertGreater(stats['hit_ratio'], 0)
+
+    def test_delete_and_bulk_import_invalidate(self):
+        scene = Scene.objects.create(user=self.user, title='one')
+        self.assertEqual(len(self.client.get('/api/scenes/').data), 1)
+        scene.delete()
+        self.assertEqual(len(self.client.get('/api/scenes/').data), 0)
+        import_ndjson(['{"type": "scene", "title": "bulk"}'], self.user)
+        self.assertEqual(len(self.client.get('/api/scenes/').data), 1)
+
+    def test_users_do_not_share_entries(self):
+        AdConfiguration.objects.create(user=self.user, theme_prompt='t', tone='fun')
+        self.client.get('/api/configs/')
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user(username='other'))
+        self.assertEqual(other.get('/api/configs/').data, [])
+
+class VariantGenerationTests(TestCase):
+    GOOD = jsoncodec.dumps([
+        {'scene_id': '1', 'visual': 'v', 'dialogue': 'Hero: Go!', 'audio': 'a',
+         'post_scene_choice_prompt': 'Pick', 'option_a_text': 'A', 'option_b_text': 'B'},
+    ] + [{'scene_id': str(i), 'visual': 'v', 'dialogue': 'Villain: No!', 'audio': 'a'} for i in range(2, 6)])
+    INVENTED = GOOD.replace('Villain:', 'Dragon:')
+    CONFIG = {'characters_or_elements': 'Hero, Villain'}
+
+    def setUp(self):
+        reset_cached_state()
+
+    def test_score_prefers_valid_grounded_scripts(self):
+        good, checks = score_script(self.GOOD, self.CONFIG)
+        self.assertEqual(checks['schema'], 1.0)
+        self.assertEqual(checks['grounding'], 1.0)
+        self.assertGreater(good, score_script(self.INVENTED, self.CONFIG)[0])
+        self.assertEqual(score_script('not json', self.CONFIG)[0], 0.0)
+
+    def test_variants_are_generated_concurrently_and_stored_ranked(self):
+        user = User.objects.create_user(username='variants')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        def fake_generate(prompt, **kwargs):
+            time.sleep(0.2)
+            text = self.INVENTED if 'humor' in prompt else self.GOOD
+            return type('Response', (), {'text': text})()
+
+        payload = {'config': self.CONFIG, 'flow': {'nodes': [], 'edges': []}, 'variants': 3}
+        with patch.object(genkit_service, 'get_generative_model') as mock_model:
+            mock_model.return_value.generate_content.side_effect = fake_generate
+            start = time.perf_counter()
+            response = client.post('/api/generate-script/', payload, format='json')
+            elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual([v['rank'] for v in response.data['variants']], [1, 2, 3])
+        self.assertEqual(response.data['script'], self.GOOD)
+        rows = GeneratedScript.objects.filter(variant_group=response.data['variant_group']).order_by('variant_rank')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2].script, self.INVENTED)
+
+    def test_variants_out_of_range_is_400(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='variants2'))
+        for variants in (0, '0', 99):
+            payload = {'config': self.CONFIG, 'flow': {'nodes': [], 'edges': []}, 'variants': variants}
+            self.assertEqual(client.post('/api/generate-script/', payload, format='json').status_code, 400, variants)
+
+class VideoPreviewTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user(username='media')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _upload(self):
+        response = self.client.post('/ads/upload_video/', {'file': SimpleUploadedFile('clip.mp4', b'not really a video')})
+        self.assertEqual(response.status_code, 201)
+        return MediaAsset.objects.get(pk=response.data['media_id'])
+
+    @override_settings(AIGE_FFMPEG_BIN='definitely-not-ffmpeg')
+    def test_without_ffmpeg_asset_is_unavailable(self):
+        asset = process_media_asset(self._upload().pk)
+        self.assertEqual(asset.status, MediaAsset.STATUS_UNAVAILABLE)
+
+    @override_settings(AIGE_FFMPEG_BIN='definitely-not-ffmpeg')
+    def test_process_media_command_retries_stuck_and_failed_assets(self):
+        stuck = self._upload()
+        fresh = self._upload()
+        failed = self._upload()
+        MediaAsset.objects.filter(pk=failed.pk).update(status=MediaAsset.STATUS_FAILED)
+        MediaAsset.objects.filter(pk=stuck.pk).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        call_command('process_media', '--pending', '--failed', stdout=io.StringIO())
+        statuses = dict(MediaAsset.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[stuck.pk], MediaAsset.STATUS_UNAVAILABLE)
+        self.assertEqual(statuses[failed.pk], MediaAsset.STATUS_UNAVAILABLE)
+        self.assertEqual(statuses[fresh.pk], MediaAsset.STATUS_PENDING)  # its job may still be running
+
+    def test_extracts_poster_sprite_and_metadata(self):
+        ffmpeg = shutil.which(settings.AIGE_FFMPEG_BIN)
+        if not ffmpeg:
+            self.skipTest('ffmpeg not installed')
+        asset = self._upload()
+        subprocess.run([ffmpeg, '-y', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=3:size=320x240:rate=10',
+                        '-pix_fmt', 'yuv420p', f'{self.media_root}/{asset.path}'], check=True)
+        asset = process_media_asset(asset.pk)
+        self.assertEqual(asset.status, MediaAsset.STATUS_READY, asset.error)
+        self.assertAlmostEqual(asset.duration, 3.0, places=1)
+        self.assertEqual((asset.width, asset.height), (320, 240))
+
+        Scene.objects.create(user=self.user, title='s', video_url_a=f'http://testserver{asset.url}')
+        preview = self.client.get('/api/scenes/').data[0]['preview_a']
+        self.assertEqual(preview['status'], 'ready')
+        self.assertIsNone(self.client.get('/api/scenes/').data[0]['preview_b'])
+        response = self.client.get(preview['poster'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_scene_etag_changes_when_preview_is_ready(self):
+        asset = MediaAsset.objects.create(user=self.user, path='videos/a.mp4', url='/media/videos/a.mp4')
+        scene = Scene.objects.create(user=self.user, title='s', video_url_a=f'http://testserver{asset.url}?u=1&sig=x')
+        other = Scene.objects.create(user=self.user, title='o', video_url_a='http://testserver/media/videos/a.mp4.bak')
+        etag = self.client.get(f'/api/scenes/{scene.pk}/')['ETag']
+        other_etag = self.client.get(f'/api/scenes/{other.pk}/')['ETag']
+        list_etag = self.client.get('/api/scenes/')['ETag']
+
+        asset.status = MediaAsset.STATUS_READY
+        asset.save()
+        response = self.client.get(f'/api/scenes/{scene.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['preview_a']['status'], 'ready')
+        self.assertEqual(self.client.get('/api/scenes/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        self.assertEqual(self.client.get(f'/api/scenes/{other.pk}/', HTTP_IF_NONE_MATCH=other_etag).status_code, 304)
+
+    def test_scene_list_resolves_previews_in_one_query(self):
+        for i in range(5):
+            MediaAsset.objects.create(user=self.user, path=f'videos/{i}.mp4', url=f'/media/videos/{i}.mp4')
+            Scene.objects.create(user=self.user, title=str(i), video_url_a=f'http://testserver/media/videos/{i}.mp4')
+        cache.clear()
+        with self.assertNumQueries(3):  # ETag aggregate, scenes, media assets
+            data = self.client.get('/api/scenes/').data
+        self.assertTrue(all(scene['preview_a']['status'] == 'pending' for scene in data))
+
+@override_settings(AIGE_MEDIA_REQUIRE_SIGNATURE=True, AIGE_MEDIA_PROCESSING=False)
+class MediaServingTests(TestCase):
+    def setUp(self):
+        VideoPreviewTests.setUp(self)
+        self.asset = VideoPreviewTests._upload(self)
+        self.signed = self.client.get('/ads/media/sign/', {'url': self.asset.url}).data['signed_url']
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=990-', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=-10', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=1000-', 1000)
+
+    def test_requires_valid_unexpired_signature(self):
+        client = APIClient()
+        self.assertEqual(client.get(self.asset.url).status_code, 403)
+        self.assertEqual(client.get(self.signed.replace('&sig=', '&sig=x')).status_code, 403)
+        self.assertEqual(client.get(self.signed.replace(f'u={self.user.id}', 'u=999')).status_code, 403)
+        response = client.get(self.signed)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'not really a video')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        other = User.objects.create_user(username='someone-else')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get('/ads/media/sign/', {'url': self.asset.url}).status_code, 404)
+        # Pointing a scene of one's own at the file doesn't make it theirs
+        planted = f'http://example.com{self.asset.url}'
+        response = self.client.post('/api/scenes/', {'title': 'x', 'user': other.pk, 'video_url_a': planted}, format='json')
+        self.assertEqual(response.status_code, 201)
+        for url in (self.asset.url, planted):
+            self.assertEqual(self.client.get('/ads/media/sign/', {'url': url}).status_code, 404)
+
+    def test_range_and_conditional_requests(self):
+        response = self.client.get(self.signed, HTTP_RANGE='bytes=4-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 4-9/18')
+        self.assertEqual(response['Content-Length'], '6')
+        self.assertEqual(b''.join(response.streaming_content), b'really')
+
+        self.assertEqual(self.client.get(self.signed, HTTP_RANGE='bytes=50-').status_code, 416)
+        stale = self.client.get(self.signed, HTTP_RANGE='bytes=4-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self.client.get(self.signed, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    @override_settings(AIGE_MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_accel_redirect_offload(self):
+        response = self.client.get(self.signed)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.asset.path}')
+        self.assertEqual(response.content, b'')
+
+        upload = self.client.post('/ads/upload_video/', {'file': SimpleUploadedFile('café.mp4', b'video')})
+        response = self.client.get(upload.data['signed_url'])
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/caf%C3%A9.mp4')
+
+class FairSchedulerTests(unittest.TestCase):
+    def _queue(self, scheduler, jobs, order):
+        def run(tenant, priority):
+            with generation_context(tenant, priority), scheduler.slot():
+                order.append((tenant, priority))
+        threads = []
+        for tenant, priority in jobs:
+            threads.append(threading.Thread(target=run, args=(tenant, priority)))
+            threads[-1].start()
+            while sum(scheduler.stats()['queued'].values()) < len(threads):
+                time.sleep(0.001)
+        return threads
+
+    def test_interactive_overtakes_batch_and_batch_tenants_interleave(self):
+        scheduler = FairScheduler(capacity=1)
+        order = []
+        scheduler.acquire()  # hold the only slot while the queue builds up
+        jobs = [('agency', BATCH)] * 3 + [('other', BATCH), ('user', INTERACTIVE)]
+        threads = self._queue(scheduler, jobs, order)
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order[0], ('user', INTERACTIVE))
+        self.assertEqual(order[1:3], [('agency', BATCH), ('other', BATCH)])
+        self.assertEqual(scheduler.stats()['active'], 0)
+
+    def test_queue_timeout_gives_up_its_place(self):
+        scheduler = FairScheduler(capacity=1)
+        scheduler.acquire()
+        with self.assertRaises(SchedulerTimeout):
+            scheduler.acquire(timeout=0.01)
+        scheduler.release()
+        self.assertEqual(scheduler.stats()['active'], 0)
+        self.assertEqual(scheduler.stats()['by_priority'][INTERACTIVE]['timeouts'], 1)
+
+@override_settings(AIGE_QUOTA_USER_DAILY=3, AIGE_QUOTA_ORG_DAILY=4, AIGE_USAGE_FLUSH_SECONDS=3600)
+class QuotaTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.alice = User.objects.create_user(username='alice')
+        self.bob = User.objects.create_user(username='bob')
+        for user in (self.alice, self.bob):
+            user.userprofile.organization = 'Acme'
+            user.userprofile.save()
+
+    def _generate(self, user, variants=1, error=None):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        payload = {'config': {'characters_or_elements': 'Hero'}, 'flow': {'nodes': [], 'edges': []}, 'variants': variants}
+        with patch.object(genkit_service, 'get_generative_model') as mock_model:
+            mock_model.return_value.generate_content.return_value.text = '[]'
+            mock_model.return_value.generate_content.side_effect = error
+            return client.post('/api/generate-script/', payload, format='json')
+
+    def test_user_and_organization_quotas(self):
+        self.assertEqual(self._generate(self.alice, variants=2).status_code, 200)
+        self.assertEqual(self._generate(self.bob, error=RuntimeError('model down')).status_code, 500)
+        self.assertEqual(self._generate(self.bob, variants=2).status_code, 200)
+
+        response = self._generate(self.bob)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.data['scope'], 'organization')
+        self.assertIn('Retry-After', response)
+
+        client = APIClient()
+        client.force_authenticate(user=self.alice)
+        user_quota, org_quota = client.get('/api/quota/').data['quotas']
+        self.assertEqual((user_quota['used'], user_quota['remaining']), (2, 1))
+        self.assertEqual((org_quota['subject'], org_quota['used'], org_quota['remaining']), ('org:Acme', 4, 0))
+
+        flush_usage()
+        ledger = UsageLedger.objects.get(subject='org:Acme')
+        self.assertEqual((ledger.requests, ledger.generations), (3, 4))  # the failed call is refunded
+
+    def test_pending_usage_is_flushed_at_exit(self):
+        with patch('atexit.register') as register:
+            apps.get_app_config('ads').ready()
+        register.assert_called_once_with(flush_usage)
+
+        quotas.record_usage(['user:exit'], datetime.date(2026, 1, 1), generations=2)
+        self.assertFalse(UsageLedger.objects.filter(subject='user:exit').exists())
+        register.call_args.args[0]()
+        self.assertEqual(UsageLedger.objects.get(subject='user:exit').generations, 2)
+
+    def test_unknown_priority_is_400(self):
+        client = APIClient()
+        client.force_authenticate(user=self.alice)
+        response = client.post('/api/generate-script/', {'config': {'a': 1}, 'flow': {'b': 1}}, format='json',
+                               HTTP_X_GENERATION_PRIORITY='urgent')
+        self.assertEqual(response.status_code, 400)
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.user = User.objects.create_user(username='clicker')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _post(self, theme, key):
+        payload = {'config': {'characters_or_elements': 'Hero', 'theme_prompt': theme}, 'flow': {'nodes': [], 'edges': []}}
+        return self.client.post('/api/generate-script/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_idempotency_key_replays_the_first_response(self):
+        with patch.object(genkit_service, 'get_generative_model') as mock_model:
+            mock_model.return_value.generate_content.return_value.text = '[]'
+            first = self._post('beach', 'k1')
+            retry = self._post('beach', 'k1')
+            reused = self._post('forest', 'k1')
+        self.assertEqual(mock_model.return_value.generate_content.call_count, 1)
+        self.assertEqual(GeneratedScript.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(reused.status_code, 422)
+
+    def test_requests_without_key_are_not_replayed_once_finished(self):
+        payload = {'config': {'characters_or_elements': 'Hero'}, 'flow': {'nodes': [], 'edges': []}}
+        with patch.object(genkit_service, 'get_generative_model') as mock_model:
+            mock_model.return_value.generate_content.return_value.text = '[]'
+            first = self.client.post('/api/generate-script/', payload, format='json')
+            again = self.client.post('/api/generate-script/', payload, format='json')
+        self.assertEqual(mock_model.return_value.generate_content.call_count, 2)
+        self.assertNotIn('Idempotent-Replayed', again)
+        self.assertEqual((first.status_code, again.status_code), (200, 200))
+
+    def test_concurrent_identical_calls_share_one_computation(self):
+        for replay in (True, False):
+            with self.subTest(replay=replay):
+                self._check_single_flight(f'test:flight:{replay}', replay)
+
+    def _check_single_flight(self, key, replay):
+        started, release, calls, results = threading.Event(), threading.Event(), [], []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 200, {'script': 'done'}
+
+        def call():
+            results.append(single_flight(key, 'fp', compute, result_ttl=10, wait_timeout=5, replay=replay))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=call) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.1)  # followers are polling
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(r[2] for r in results), [False, True, True, True])
+        self.assertTrue(all(r[1] == {'script': 'done'} for r in results))
+
+        late = single_flight(key, 'fp', lambda: (200, {'script': 'again'}), result_ttl=10, replay=replay)
+        self.assertEqual(late[2], replay)
+
+class LabelSyncTests(TestCase):
+    def setUp(self):
+        reset_cached_state()
+        self.user = User.objects.create_user(username='author')
+        self.flow = make_flow(6)
+
+    def test_updates_only_changed_choice_nodes(self):
+        script = jsoncodec.dumps([
+            {'scene_id': 's0', 'post_scene_choice_prompt': 'Which way?', 'option_a_text': 'Left', 'option_b_text': 'Right'},
+            {'scene_title': 'Scene 2', 'option_a_text': 'Go to 3', 'option_b_text': 'Go to 4'},  # unchanged
+        ])
+        updates = choice_label_updates(script, self.flow)
+        self.assertEqual(updates, {'c0': {'description': 'Which way?', 'options': ['Left', 'Right']}})
+
+        nodes, changed = apply_label_updates(self.flow['nodes'], updates)
+        self.assertEqual(changed, ['c0'])
+        self.assertEqual([o['label'] for o in nodes[1]['data']['options']], ['Left', 'Right'])
+        self.assertEqual(nodes[1]['data']['options'][0]['nextSceneId'], 's1')
+        self.assertEqual(self.flow['nodes'][1]['data']['options'][0]['label'], 'Go to 1')
+        self.assertTrue(all(new is old for new, old in zip(nodes, self.flow['nodes']) if new['id'] != 'c0'))
+
+    def test_repeated_and_unknown_scene_ids_are_skipped(self):
+        flow = make_flow(8)
+        repeated = jsoncodec.dumps([
+            {'scene_id': 's0', 'option_a_text': 'Left', 'option_b_text': 'Right'},
+            {'scene_id': 's0', 'option_a_text': 'Up', 'option_b_text': 'Down'},
+        ])
+        self.assertEqual(choice_label_updates(repeated, flow), {'c0': {'description': 'Choice after scene 0', 'options': ['Left', 'Right']}})
+        invented = jsoncodec.dumps([{'scene_id': 'Intro', 'option_a_text': 'Up', 'option_b_text': 'Down'}])
+        self.assertEqual(choice_label_updates(invented, flow), {})
+
+    def test_generation_syncs_labels_into_the_saved_config(self):
+        config = AdConfiguration.objects.create(user=self.user, theme_prompt='Space', tone='Fun', **self.flow)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with patch.object(genkit_service, 'get_generative_model') as mock_model:
+            mock_model.return_value.generate_content.return_value.text = jsoncodec.dumps([
+                {'scene_id': 's2', 'visual': 'v', 'option_a_text': 'Fight', 'option_b_text': 'Flee'},
+            ])
+            response = client.post('/api/generate-script/', {
+                'config': {'id': config.pk, 'characters_or_elements': 'Hero'}, 'flow': self.flow,
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['label_updates']), ['c2'])
+        config.refresh_from_db()
+        choice = next(node for node in config.nodes if node['id'] == 'c2')
+        self.assertEqual([o['label'] for o in choice['data']['options']], ['Fight', 'Flee'])
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'query plans are PostgreSQL specific')
+@override_settings(AIGE_READ_CACHE=False)
+class QueryPlanTests(TestCase):
+    """
+    Seeds realistic volumes and checks that every hot query is answered from an index.
+    """
+    USERS = 40
+    ROWS_PER_USER = 250
+    TABLES = ('ads_scene', 'ads_adconfiguration', 'ads_generatedscript', 'ads_mediaasset')
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username=f'plan{i}') for i in range(cls.USERS)])
+        scenes, configs, scripts, assets = [], [], [], []
+        # Interleave users, as rows arrive in production
+        for i in range(cls.ROWS_PER_USER):
+            for user in users:
+                url = f'/media/videos/{user.pk}-{i}.mp4'
+                scenes.append(Scene(user=user, title=str(i), video_url_a=f'http://testserver{url}'))
+                assets.append(MediaAsset(user=user, path=url[len('/media/'):], url=url))
+                configs.append(AdConfiguration(user=user, theme_prompt='t', tone='fun',
+                                               nodes=[{'id': f'n{user.pk}-{i}', 'type': 'scene'}], edges=[]))
+                scripts.append(GeneratedScript(user=user, config={}, flow={}, script='[]'))
+        for model, rows in ((Scene, scenes), (AdConfiguration, configs), (GeneratedScript, scripts), (MediaAsset, assets)):
+            model.objects.bulk_create(rows, batch_size=2000)
+        with connection.cursor() as cursor:
+            for table in cls.TABLES:
+                cursor.execute(f'ANALYZE {table}')
+        cls.user = users[0]
+
+    def _plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def assertIndexed(self, sql, index=None):
+        plan = self._plan(sql)
+        for table in self.TABLES:
+            self.assertNotIn(f'Seq Scan on {table}', plan, f'{sql}\n{plan}')
+        if index:
+            self.assertIn(index, plan, f'{sql}\n{plan}')
+
+    def _endpoint_queries(self, path):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(client.get(path).status_code, 200)
+        return [q['sql'] for q in queries if q['sql'].startswith('SELECT') and any(t in q['sql'] for t in self.TABLES)]
+
+    def test_list_and_detail_endpoints(self):
+        scene = Scene.objects.filter(user=self.user).first()
+        config = AdConfiguration.objects.filter(user=self.user).first()
+        for path, table in (('/api/scenes/', 'ads_scene'), ('/api/configs/', 'ads_adconfiguration'),
+                            (f'/api/scenes/{scene.pk}/', 'ads_scene'), (f'/api/configs/{config.pk}/', 'ads_adconfiguration')):
+            queries = self._endpoint_queries(path)
+            self.assertTrue(any(table in sql for sql in queries), path)
+            for sql in queries:
+                self.assertIndexed(sql)
+
+    def test_named_indexes_serve_their_queries(self):
+        # Latest-N pages can only avoid a sort through the ordered composite index
+        scenes = Scene.objects.filter(user=self.user).order_by('-created_at', '-id')[:20]
+        self.assertIndexed(str(scenes.query), 'scene_user_created_idx')
+        configs = AdConfiguration.objects.filter(user=self.user).order_by('-created_at', '-id')[:20]
+        self.assertIndexed(str(configs.query), 'adconfig_user_created_idx')
+        history = GeneratedScript.objects.filter(user=self.user).order_by('-created_at')[:20]
+        self.assertIndexed(str(history.query), 'genscript_user_created_idx')
+        admin_page = GeneratedScript.objects.order_by('-created_at', '-id')[:100]
+        self.assertIndexed(str(admin_page.query), 'genscript_created_idx')
+
+    def test_flow_containment_uses_gin(self):
+        queryset = AdConfiguration.objects.filter(nodes__contains=[{'id': f'n{self.user.pk}-3'}])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(queryset.count(), 1)
+        self.assertIndexed(queries[-1]['sql'], 'adconfig_nodes_gin')
+
+def tearDownModule():
+    # Nothing recorded by tests may reach the real database through the exit flush
+    with quotas._pending_lock:
+        quotas._pending.clear()
+
 if __name__ == '__main__':
     unittest.main()
+
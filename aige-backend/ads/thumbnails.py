@@ -0,0 +1,175 @@
+"""
+Background extraction of video previews: a poster frame, a scrub sprite sheet and
+duration/resolution metadata, via ffmpeg/ffprobe when they are installed.
+
+Artifacts are written under MEDIA_ROOT/thumbs/ with names derived from the source
+file's path, size and mtime, so their URLs never change content and can be served
+with far-future cache headers.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+THUMBS_DIR = 'thumbs'
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_RESOLUTION_RE = re.compile(r"Video:.*?(\d{2,5})x(\d{2,5})")
+
+
+def _run(args):
+    return subprocess.run(
+        args, capture_output=True, text=True, timeout=settings.AIGE_FFMPEG_TIMEOUT, check=False,
+    )
+
+
+def probe(path):
+    """
+    Returns ``{"duration", "width", "height"}`` for a video. Uses ffprobe when available
+    and falls back to parsing ``ffmpeg -i`` output.
+    """
+    ffprobe = shutil.which(settings.AIGE_FFPROBE_BIN)
+    if ffprobe:
+        result = _run([ffprobe, '-v', 'error', '-select_streams', 'v:0',
+                       '-show_entries', 'stream=width,height:format=duration', '-of', 'json', path])
+        if result.returncode == 0:
+            data = json.loads(result.stdout or '{}')
+            stream = (data.get('streams') or [{}])[0]
+            duration = data.get('format', {}).get('duration')
+            return {
+                'duration': float(duration) if duration not in (None, 'N/A') else None,
+                'width': stream.get('width'),
+                'height': stream.get('height'),
+            }
+
+    result = _run([shutil.which(settings.AIGE_FFMPEG_BIN), '-hide_banner', '-i', path])
+    info = {'duration': None, 'width': None, 'height': None}
+    match = _DURATION_RE.search(result.stderr)
+    if match:
+        h, m, s = match.groups()
+        info['duration'] = int(h) * 3600 + int(m) * 60 + float(s)
+    match = _RESOLUTION_RE.search(result.stderr)
+    if match:
+        info['width'], info['height'] = int(match.group(1)), int(match.group(2))
+    return info
+
+
+def _artifact_name(asset, source, suffix):
+    stat = os.stat(source)
+    digest = hashlib.sha1(f"{asset.path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+    return f"{THUMBS_DIR}/{digest}-{suffix}"
+
+
+def _ffmpeg(*args):
+    result = _run([shutil.which(settings.AIGE_FFMPEG_BIN), '-nostdin', '-y', '-v', 'error', *args])
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+
+
+def extract_poster(source, dest, duration):
+    at = min(1.0, duration * 0.1) if duration else 0
+    _ffmpeg('-ss', f"{at:.3f}", '-i', source, '-frames:v', '1',
+            '-vf', f"scale={settings.AIGE_POSTER_WIDTH}:-2", '-q:v', '4', dest)
+
+
+def extract_sprite(source, dest, duration):
+    """
+    Tiles evenly spaced frames into one image. Returns (columns, rows, interval_seconds).
+    """
+    frames = max(1, min(settings.AIGE_SPRITE_FRAMES, int(duration or 1)))
+    columns = min(5, frames)
+    rows = math.ceil(frames / columns)
+    interval = (duration or 1) / frames
+    _ffmpeg('-i', source,
+            '-vf', f"fps=1/{interval:.4f},scale={settings.AIGE_SPRITE_TILE_WIDTH}:-2,tile={columns}x{rows}",
+            '-frames:v', '1', '-q:v', '5', dest)
+    return columns, rows, interval
+
+
+def process_media_asset(asset_id):
+    """
+    Extracts metadata, poster and sprite for one MediaAsset and stores them on it.
+    """
+    asset = MediaAsset.objects.get(pk=asset_id)
+    if not shutil.which(settings.AIGE_FFMPEG_BIN):
+        asset.status = MediaAsset.STATUS_UNAVAILABLE
+        asset.save(update_fields=['status', 'updated_at'])
+        return asset
+
+    source = os.path.join(settings.MEDIA_ROOT, asset.path)
+    try:
+        info = probe(source)
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, THUMBS_DIR), exist_ok=True)
+        poster = _artifact_name(asset, source, 'poster.jpg')
+        sprite = _artifact_name(asset, source, 'sprite.jpg')
+        extract_poster(source, os.path.join(settings.MEDIA_ROOT, poster), info['duration'])
+        columns, rows, interval = extract_sprite(source, os.path.join(settings.MEDIA_ROOT, sprite), info['duration'])
+    except (OSError, RuntimeError, ValueError, subprocess.TimeoutExpired) as e:
+        logger.warning("Preview extraction failed for %s: %s", asset.path, e)
+        asset.status = MediaAsset.STATUS_FAILED
+        asset.error = str(e)[:2000]
+        asset.save(update_fields=['status', 'error', 'updated_at'])
+        return asset
+
+    asset.duration = info['duration']
+    asset.width = info['width']
+    asset.height = info['height']
+    asset.poster = poster
+    asset.sprite = sprite
+    asset.sprite_columns = columns
+    asset.sprite_rows = rows
+    asset.sprite_interval = interval
+    asset.status = MediaAsset.STATUS_READY
+    asset.error = ''
+    asset.save()
+    return asset
+
+
+def _process_job(asset_id):
+    close_old_connections()
+    try:
+        process_media_asset(asset_id)
+    except Exception:
+        logger.exception("Preview job for MediaAsset %s crashed", asset_id)
+    finally:
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_media_executor():
+    """
+    The per-process pool preview jobs run on, so at most AIGE_MEDIA_WORKERS ffmpeg
+    jobs run at once however many uploads arrive; the rest queue.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.AIGE_MEDIA_WORKERS, thread_name_prefix='media')
+    return _executor
+
+
+def schedule_media_processing(asset_id):
+    """
+    Queues preview extraction once the upload has committed. Jobs lost with their
+    worker leave the asset pending; ``manage.py process_media --pending`` picks them up.
+    """
+    if not settings.AIGE_MEDIA_PROCESSING:
+        return
+    transaction.on_commit(lambda: get_media_executor().submit(_process_job, asset_id))
@@ -1,7 +1,9 @@
 # ads/urls.py
 from django.urls import path
-from .views import VideoUploadView
+from .views import VideoUploadView, MediaSignView, serve_thumbnail
 
 urlpatterns = [
     path('upload_video/', VideoUploadView.as_view(), name='upload_video'),
-]
\ No newline at end of file
+    path('media/sign/', MediaSignView.as_view(), name='media_sign'),
+    path('thumbs/<path:name>', serve_thumbnail, name='thumbnail'),
+]
@@ -0,0 +1,111 @@
+"""
+Multi-variant script generation: N candidates generated concurrently, then scored with
+cheap local checks and ranked.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from . import jsoncodec
+from .genkit_service import call_genkit_script_generation
+
+# The prompt asks for exactly this many scene objects
+EXPECTED_SCENES = 5
+
+REQUIRED_KEYS = ("visual", "dialogue", "audio")
+CHOICE_KEYS = ("post_scene_choice_prompt", "option_a_text", "option_b_text")
+GENERIC_SPEAKERS = {"narrator", "voiceover", "voice over", "vo", "announcer"}
+
+# One direction per candidate; the first candidate uses the config as-is
+VARIANT_HINTS = (
+    "",
+    "Open with a bold, attention-grabbing hook in the first two seconds.",
+    "Lean into humor and playful dialogue.",
+    "Make it more emotional and heartfelt.",
+    "Add a surprising twist before the final scene.",
+)
+
+_SPEAKER_RE = re.compile(r"(?m)^\s*([A-Za-z][\w .'-]{0,40}?)\s*:")
+
+
+def _text(value):
+    if isinstance(value, list):
+        return "\n".join(str(v) for v in value)
+    return str(value or "")
+
+
+def score_script(script_text, config):
+    """
+    Scores a generated script between 0 and 1. Returns ``(score, checks)`` where checks
+    holds the individual components:
+    - schema: fraction of scenes with an id plus visual/dialogue/audio
+    - scene_count: closeness to the EXPECTED_SCENES the prompt asks for
+    - choice: whether some scene carries the embedded choice logic
+    - grounding: fraction of dialogue speakers taken from characters_or_elements
+    - coverage: fraction of the provided characters/elements that appear at all
+    """
+    try:
+        scenes = jsoncodec.loads(script_text)
+    except ValueError:
+        return 0.0, {"valid_json": False}
+    if not isinstance(scenes, list) or not scenes or not all(isinstance(s, dict) for s in scenes):
+        return 0.0, {"valid_json": True, "schema": 0.0}
+
+    schema = sum(
+        1 for s in scenes
+        if (s.get("scene_id") or s.get("scene_title")) and all(s.get(k) for k in REQUIRED_KEYS)
+    ) / len(scenes)
+    scene_count = max(0.0, 1 - abs(len(scenes) - EXPECTED_SCENES) / EXPECTED_SCENES)
+    choice = 1.0 if any(all(s.get(k) for k in CHOICE_KEYS) for s in scenes) else 0.0
+
+    allowed = {e.strip().lower() for e in config.get("characters_or_elements", "").split(",") if e.strip()}
+    speakers = [
+        name.strip().lower()
+        for s in scenes
+        for name in _SPEAKER_RE.findall(_text(s.get("dialogue")))
+    ]
+    known = allowed | GENERIC_SPEAKERS
+    grounding = sum(1 for sp in speakers if sp in known) / len(speakers) if speakers else 1.0
+    full_text = script_text.lower()
+    coverage = sum(1 for e in allowed if e in full_text) / len(allowed) if allowed else 1.0
+
+    checks = {
+        "valid_json": True,
+        "schema": round(schema, 3),
+        "scene_count": round(scene_count, 3),
+        "choice": choice,
+        "grounding": round(grounding, 3),
+        "coverage": round(coverage, 3),
+    }
+    score = 0.4 * schema + 0.2 * scene_count + 0.15 * choice + 0.15 * grounding + 0.1 * coverage
+    return round(score, 4), checks
+
+
+def generate_variants(config, flow, count, generate=call_genkit_script_generation):
+    """
+    Generates ``count`` candidates concurrently (one thread each; the model call is
+    I/O bound) and returns the successful ones ranked best first as
+    ``[{"script", "score", "checks", "hint"}, ...]``. Raises the first error if every
+    candidate failed.
+    """
+    hints = [VARIANT_HINTS[i % len(VARIANT_HINTS)] for i in range(count)]
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        # copy_context keeps request-scoped state (profiling spans) visible in the workers
+        futures = [pool.submit(copy_context().run, generate, config, flow, hint) for hint in hints]
+
+    candidates = []
+    errors = []
+    for hint, future in zip(hints, futures):
+        try:
+            script = future.result()
+        except Exception as e:
+            errors.append(e)
+            continue
+        score, checks = score_script(script, config)
+        candidates.append({"script": script, "score": score, "checks": checks, "hint": hint})
+
+    if not candidates:
+        raise errors[0]
+    # Stable sort: equal scores keep generation order, so the un-hinted candidate wins ties
+    candidates.sort(key=lambda c: c["score"], reverse=True)
+    return candidates
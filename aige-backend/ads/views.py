@@ -4,37 +4,70 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Scene, AdConfiguration, GeneratedScript
-from .serializers import SceneSerializer, AdConfigurationSerializer
+from .models import Scene, AdConfiguration, GeneratedScript, MediaAsset
+from .serializers import SceneSerializer, AdConfigurationSerializer, media_assets_for, media_path
 from .utils import build_ai_prompt, call_gemini_or_gpt
+from .label_sync import sync_config_labels
+from .profiling import InstrumentedViewMixin, span
+from .authentication import TokenUserForReadsMixin
+from .conditional import ConditionalGetMixin
+from .caching import CachedReadMixin
+from .parsers import NDJSONParser
+from .bulk import BulkImportError, export_ndjson, import_ndjson
+from .variants import generate_variants
+from .thumbnails import THUMBS_DIR, schedule_media_processing
+from .media import signed_media_url
+from . import quotas
+from .quotas import QuotaExceeded
+from .idempotency import coalesced_response
+from .scheduler import INTERACTIVE, SchedulerTimeout, generation_context
 from django.conf import settings
+from django.utils import timezone
+import logging
 import os
+import uuid
 from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.core.exceptions import SuspiciousFileOperation
+
+logger = logging.getLogger(__name__)
 
 # ----------- SCENE VIEWSET -----------
-class SceneViewSet(viewsets.ModelViewSet):
+class SceneViewSet(InstrumentedViewMixin, TokenUserForReadsMixin, CachedReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = SceneSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Scene.objects.filter(user=self.request.user)
+        # Newest first; served by scene_user_created_idx
+        return Scene.objects.filter(user_id=self.request.user.id).order_by('-created_at', '-id')
+
+    def get_serializer(self, *args, **kwargs):
+        # Resolve video previews for the whole page with one query
+        if args and args[0] is not None:
+            scenes = list(args[0]) if kwargs.get('many') else [args[0]]
+            if kwargs.get('many'):
+                args = (scenes,) + args[1:]
+            kwargs.setdefault('context', self.get_serializer_context())
+            kwargs['context']['media_assets'] = media_assets_for(scenes)
+        return super().get_serializer(*args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 # ----------- CONFIG VIEWSET -----------
-class AdConfigurationViewSet(viewsets.ModelViewSet):
+class AdConfigurationViewSet(InstrumentedViewMixin, TokenUserForReadsMixin, CachedReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = AdConfigurationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return AdConfiguration.objects.filter(user=self.request.user)
+        return AdConfiguration.objects.filter(user_id=self.request.user.id).order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 # ----------- SCRIPT GENERATION -----------
-class ScriptGenerationView(APIView):
+class ScriptGenerationView(InstrumentedViewMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -44,21 +77,121 @@ class ScriptGenerationView(APIView):
         if not config or not flow:
             return Response({"error": "Missing config or flow"}, status=400)
 
+        variants = request.data.get("variants")
+        if variants is None:
+            variants = request.query_params.get("variants", 1)
+        try:
+            variants = int(variants)
+        except (TypeError, ValueError):
+            return Response({"error": "variants must be an integer"}, status=400)
+        if not 1 <= variants <= settings.AIGE_MAX_VARIANTS:
+            return Response({"error": f"variants must be between 1 and {settings.AIGE_MAX_VARIANTS}"}, status=400)
+        priority = (request.headers.get("X-Generation-Priority") or INTERACTIVE).lower()
+        if priority not in settings.AIGE_PRIORITY_WEIGHTS:
+            return Response({"error": f"X-Generation-Priority must be one of {', '.join(settings.AIGE_PRIORITY_WEIGHTS)}"}, status=400)
+
+        # Retries with the same Idempotency-Key, and identical requests already in
+        # flight, get the first request's response instead of another model call
+        return coalesced_response(
+            request,
+            {"config": config, "flow": flow, "variants": variants},
+            lambda: self._generate(request, config, flow, variants, priority),
+        )
+
+    def _generate(self, request, config, flow, variants, priority):
         try:
-            prompt = build_ai_prompt(config, flow)
-            script = call_gemini_or_gpt(prompt)
+            reservation = quotas.reserve(request.user.id, variants)
+        except QuotaExceeded as e:
+            return Response(
+                {"error": str(e), "scope": e.scope, "limit": e.limit, "resets_at": e.resets_at.isoformat()},
+                status=429,
+                headers={"Retry-After": str(max(1, int((e.resets_at - timezone.now()).total_seconds())))},
+            )
+
+        # Model calls below queue fairly per tenant and priority (see ads.scheduler)
+        with generation_context(quotas.tenant_for(request.user.id), priority):
+            if variants > 1:
+                return self._generate_variants(request, config, flow, variants, reservation)
+
+            try:
+                prompt = build_ai_prompt(config, flow)
+                script = call_gemini_or_gpt(prompt)
+                reservation.settle(1)
+
+                with span("db_insert"):
+                    GeneratedScript.objects.create(
+                        user=request.user,
+                        config=config,
+                        flow=flow,
+                        script=script
+                    )
+
+                return Response({"script": script, "label_updates": self._sync_labels(request, config, flow, script)})
+
+            except SchedulerTimeout as e:
+                reservation.settle(0)
+                return Response({"error": str(e)}, status=503, headers={"Retry-After": "5"})
+            except Exception as e:
+                reservation.settle(0)
+                return Response({"error": str(e)}, status=500)
+
+    def _sync_labels(self, request, config, flow, script):
+        """
+        Writes the script's choice text into the saved configuration the flow came from
+        (the config's ``id``, when present). A failed sync never fails the generation.
+        """
+        config_id = config.get("id") if isinstance(config, dict) else None
+        try:
+            with span("label_sync"):
+                return sync_config_labels(request.user.id, config_id, flow, script)
+        except Exception:
+            logger.exception("Syncing choice labels into config %s failed", config_id)
+            return {}
+
+    def _generate_variants(self, request, config, flow, count, reservation):
+        try:
+            candidates = generate_variants(config, flow, count)
+        except SchedulerTimeout as e:
+            reservation.settle(0)
+            return Response({"error": str(e)}, status=503, headers={"Retry-After": "5"})
+        except Exception as e:
+            reservation.settle(0)
+            return Response({"error": str(e)}, status=500)
+        reservation.settle(len(candidates))
 
-            GeneratedScript.objects.create(
+        group = uuid.uuid4()
+        rows = [
+            GeneratedScript(
                 user=request.user,
                 config=config,
                 flow=flow,
-                script=script
+                script=candidate["script"],
+                variant_group=group,
+                variant_rank=rank,
+                score=candidate["score"],
             )
+            for rank, candidate in enumerate(candidates, start=1)
+        ]
+        with span("db_insert"):
+            GeneratedScript.objects.bulk_create(rows)
 
-            return Response({"script": script})
+        return Response({
+            "script": candidates[0]["script"],
+            "label_updates": self._sync_labels(request, config, flow, candidates[0]["script"]),
+            "variant_group": str(group),
+            "variants": [
+                {"id": row.pk, "rank": row.variant_rank, "score": row.score,
+                 "checks": candidate["checks"], "script": row.script}
+                for row, candidate in zip(rows, candidates)
+            ],
+        })
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+# ----------- GENERATION QUOTA -----------
+class QuotaView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(quotas.quota_status(request.user.id))
 
 # ----------- VIDEO UPLOAD ENDPOINT -----------
 class VideoUploadView(APIView):
@@ -69,7 +202,73 @@ class VideoUploadView(APIView):
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({'error': 'No file provided'}, status=400)
-        # Save the file to MEDIA_ROOT/videos/
+        # Save the file to MEDIA_ROOT/videos/ (the storage may rename it to avoid clashes)
         file_path = default_storage.save(f'videos/{file_obj.name}', file_obj)
-        video_url = f"{settings.MEDIA_URL}videos/{file_obj.name}"
-        return Response({'video_url': video_url}, status=201)
\ No newline at end of file
+        video_url = f"{settings.MEDIA_URL}{file_path}"
+        asset = MediaAsset.objects.create(user=request.user, path=file_path, url=video_url)
+        schedule_media_processing(asset.pk)
+        return Response({
+            'video_url': video_url,
+            'signed_url': signed_media_url(file_path, request.user.id),
+            'media_id': asset.pk,
+        }, status=201)
+
+class MediaSignView(APIView):
+    """
+    Returns a fresh signed, expiring URL for a video the user owns
+    (``?url=`` takes either the stored video_url or its path).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        url = request.query_params.get('url', '')
+        path = media_path(url)
+        if not path.startswith(settings.MEDIA_URL):
+            return Response({'error': 'url must point into MEDIA_URL'}, status=400)
+        # Only the uploader owns a file; scene video URLs are user-writable and prove nothing
+        if not MediaAsset.objects.filter(user_id=request.user.id, url=path).exists():
+            return Response({'error': 'Not found'}, status=404)
+        return Response({
+            'signed_url': signed_media_url(path[len(settings.MEDIA_URL):], request.user.id),
+            'expires_in': settings.AIGE_MEDIA_URL_TTL,
+        })
+
+# ----------- VIDEO PREVIEW ARTIFACTS -----------
+def serve_thumbnail(request, name):
+    """
+    Serves posters/sprites. Their names change whenever the source video changes,
+    so clients may cache them forever.
+    """
+    try:
+        path = safe_join(settings.MEDIA_ROOT, THUMBS_DIR, name)
+    except SuspiciousFileOperation:
+        raise Http404()
+    if not os.path.isfile(path):
+        raise Http404()
+    response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# ----------- BULK IMPORT / EXPORT -----------
+class BulkImportView(InstrumentedViewMixin, APIView):
+    parser_classes = (NDJSONParser,)
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            batch_size = int(request.query_params.get('batch_size', 500))
+        except ValueError:
+            return Response({'error': 'batch_size must be an integer'}, status=400)
+        try:
+            result = import_ndjson(request.data, request.user, batch_size=max(1, batch_size))
+        except BulkImportError as e:
+            return Response({'error': str(e), 'line': e.line}, status=400)
+        return Response(result, status=201)
+
+class BulkExportView(InstrumentedViewMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        response = StreamingHttpResponse(export_ndjson(request.user), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="aige-export.ndjson"'
+        return response
@@ -30,12 +30,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'ads.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ads.middleware.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'aige.urls'
@@ -66,9 +68,27 @@ DATABASES = {
         'PASSWORD': os.getenv("POSTGRES_PASSWORD"),
         'HOST': os.getenv("POSTGRES_HOST"),
         'PORT': os.getenv("POSTGRES_PORT", "5432"),
+        # Ping reused connections before handing them out (also enables pool checks)
+        'CONN_HEALTH_CHECKS': True,
+        # Keep connections open across requests when not pooling
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        'OPTIONS': {},
     }
 }
 
+# Connection pooling (psycopg3 + psycopg_pool). Pooled connections are returned to the
+# pool at the end of each request, so CONN_MAX_AGE must be 0 in this mode.
+if os.getenv("DB_POOL", "1") == "1":
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        'max_size': int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        # Seconds a request waits for a free connection before erroring
+        'timeout': float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        'max_idle': float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+        'max_lifetime': float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -88,11 +108,20 @@ AUTH_PASSWORD_VALIDATORS = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'ads.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'ads.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'ads.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # JWT Configuration
@@ -103,6 +132,55 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Seconds a token's user record stays cached; invalidated on User/UserProfile saves
+AIGE_AUTH_CACHE_TTL = int(os.getenv("AIGE_AUTH_CACHE_TTL", "60"))
+# Authenticate read-only viewset requests from the JWT claims alone (no user lookup)
+AIGE_AUTH_LEAN_READS = os.getenv("AIGE_AUTH_LEAN_READS", "0") == "1"
+
+# Cache. Use a shared backend (Redis) in production so invalidations reach every worker.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Two-level (per-process LRU + CACHES) cache for config/scene reads
+AIGE_READ_CACHE = os.getenv("AIGE_READ_CACHE", "1") == "1"
+AIGE_READ_CACHE_TTL = int(os.getenv("AIGE_READ_CACHE_TTL", "300"))
+AIGE_LOCAL_CACHE_SIZE = int(os.getenv("AIGE_LOCAL_CACHE_SIZE", "1024"))
+
+# Upper bound for the variants=N option of /api/generate-script/
+AIGE_MAX_VARIANTS = int(os.getenv("AIGE_MAX_VARIANTS", "5"))
+
+# Daily generation quotas (model calls; variants=N counts N). 0 disables a limit.
+AIGE_QUOTA_USER_DAILY = int(os.getenv("AIGE_QUOTA_USER_DAILY", "500"))
+AIGE_QUOTA_ORG_DAILY = int(os.getenv("AIGE_QUOTA_ORG_DAILY", "5000"))
+# The UsageLedger table is written in batches
+AIGE_USAGE_FLUSH_SECONDS = float(os.getenv("AIGE_USAGE_FLUSH_SECONDS", "10"))
+AIGE_USAGE_FLUSH_ROWS = int(os.getenv("AIGE_USAGE_FLUSH_ROWS", "100"))
+
+# Idempotency-Key replay window, and how long requests without a key that waited on an
+# identical in-flight one can still collect its result (see ads.idempotency)
+AIGE_IDEMPOTENCY_TTL = int(os.getenv("AIGE_IDEMPOTENCY_TTL", "86400"))
+AIGE_COALESCE_RESULT_TTL = int(os.getenv("AIGE_COALESCE_RESULT_TTL", "10"))
+# Upper bound on one generation; a crashed leader's lock expires after this
+AIGE_IDEMPOTENCY_LOCK_TTL = int(os.getenv("AIGE_IDEMPOTENCY_LOCK_TTL", "300"))
+AIGE_IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("AIGE_IDEMPOTENCY_WAIT_TIMEOUT", "120"))
+
+# Fair-share scheduling of model calls (ads.scheduler), per worker process
+AIGE_GENERATION_CONCURRENCY = int(os.getenv("AIGE_GENERATION_CONCURRENCY", "8"))
+AIGE_GENERATION_QUEUE_TIMEOUT = float(os.getenv("AIGE_GENERATION_QUEUE_TIMEOUT", "120"))
+# Selected per request with the X-Generation-Priority header
+AIGE_PRIORITY_WEIGHTS = {"interactive": 8, "batch": 2, "speculative": 1}
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -134,7 +212,46 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-generation-priority',
+    'idempotency-key',
 ]
 
+# Request profiling (opt-in). When off, the middleware unloads itself at startup.
+AIGE_PROFILING = os.getenv("AIGE_PROFILING", "0") == "1"
+# Fraction of requests to run under cProfile/pyinstrument; only slow ones are dumped
+AIGE_PROFILING_SAMPLE_RATE = float(os.getenv("AIGE_PROFILING_SAMPLE_RATE", "0"))
+AIGE_PROFILING_SLOW_MS = float(os.getenv("AIGE_PROFILING_SLOW_MS", "1000"))
+AIGE_PROFILING_DIR = os.getenv("AIGE_PROFILING_DIR", os.path.join(BASE_DIR, 'profiles'))
+# Bearer token Prometheus sends to scrape /metrics; staff sessions may always read it
+AIGE_METRICS_TOKEN = os.getenv("AIGE_METRICS_TOKEN", "")
+
+# Responses smaller than this are sent uncompressed
+AIGE_COMPRESS_MIN_BYTES = int(os.getenv("AIGE_COMPRESS_MIN_BYTES", "1024"))
+# How long compressed bodies of ETagged responses are kept for reuse
+AIGE_COMPRESS_CACHE_TTL = int(os.getenv("AIGE_COMPRESS_CACHE_TTL", "3600"))
+# Never compressed: token responses carry secrets next to attacker-influenced input (BREACH)
+AIGE_COMPRESS_EXCLUDE_PATHS = ("/api/token/",)
+
+# Video preview extraction (poster, sprite sheet, metadata) after uploads
+AIGE_MEDIA_PROCESSING = os.getenv("AIGE_MEDIA_PROCESSING", "1") == "1"
+# Preview jobs (ffprobe/ffmpeg) running at once per process; further uploads queue
+AIGE_MEDIA_WORKERS = int(os.getenv("AIGE_MEDIA_WORKERS", "2"))
+AIGE_FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+AIGE_FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+AIGE_FFMPEG_TIMEOUT = int(os.getenv("FFMPEG_TIMEOUT", "120"))
+AIGE_POSTER_WIDTH = 480
+AIGE_SPRITE_TILE_WIDTH = 160
+AIGE_SPRITE_FRAMES = 25
+
+# Media serving (ads.media.serve_media). Signed URLs are issued by the upload and
+# /ads/media/sign/ endpoints; require them by default outside DEBUG.
+AIGE_MEDIA_REQUIRE_SIGNATURE = os.getenv("AIGE_MEDIA_REQUIRE_SIGNATURE", "0" if DEBUG else "1") == "1"
+AIGE_MEDIA_URL_TTL = int(os.getenv("AIGE_MEDIA_URL_TTL", "3600"))
+AIGE_MEDIA_MAX_AGE = int(os.getenv("AIGE_MEDIA_MAX_AGE", "3600"))
+# Hand the transfer to the front-end server: an internal nginx location for
+# X-Accel-Redirect (e.g. "/protected-media/"), or "1" for Apache/lighttpd X-Sendfile
+AIGE_MEDIA_ACCEL_REDIRECT = os.getenv("AIGE_MEDIA_ACCEL_REDIRECT", "")
+AIGE_MEDIA_X_SENDFILE = os.getenv("AIGE_MEDIA_X_SENDFILE", "0") == "1"
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
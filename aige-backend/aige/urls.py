@@ -1,11 +1,12 @@
 from django.contrib import admin
-from django.urls import path, include
-from ads.views import ScriptGenerationView
+from django.urls import path, re_path, include
+from ads.views import ScriptGenerationView, QuotaView, BulkImportView, BulkExportView
 from rest_framework.routers import DefaultRouter
 from ads.views import SceneViewSet, AdConfigurationViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.conf import settings
-from django.conf.urls.static import static
+from ads.metrics import metrics_view
+from ads.media import serve_media
 
 router = DefaultRouter()
 router.register(r'scenes', SceneViewSet, basename='scene')
@@ -17,9 +18,18 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path("api/generate-script/", ScriptGenerationView.as_view(), name="generate-script"),
+    path("api/quota/", QuotaView.as_view(), name="quota"),
+    path('api/bulk/import/', BulkImportView.as_view(), name='bulk-import'),
+    path('api/bulk/export/', BulkExportView.as_view(), name='bulk-export'),
     path('ads/', include('ads.urls')),
 ]
 
-if settings.DEBUG:
-       urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.AIGE_PROFILING:
+    urlpatterns.append(path('metrics', metrics_view, name='metrics'))
+
+# Uploaded media, with Range support for video seeking (see ads.media)
+urlpatterns.append(
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media')
+)
+
 
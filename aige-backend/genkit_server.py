@@ -1,35 +1,101 @@
 #!/usr/bin/env python3
 """
-Standalone Genkit server for script generation.
+Standalone script generation server.
 Run this with: python genkit_server.py
+
+Exposes the same Gemini pipeline the Django views use, without loading Django:
+
+    POST /generate  {"config": {...}, "flow": {...}, "variant_hint": ""}  ->  {"script": "..."}
+    GET  /health
 """
 
+import json
 import os
 import sys
-import django
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 # Add the project directory to Python path
 BASE_DIR = Path(__file__).resolve().parent
 sys.path.append(str(BASE_DIR))
 
-# Setup Django environment
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'aige.settings')
-django.setup()
+# ads.genkit_service only depends on Django-free helpers, so no django.setup() here
+from ads.genkit_service import generate_structured_ad_script, get_genai
+from ads.scheduler import SchedulerTimeout
+
+PORT = int(os.getenv("GENKIT_PORT", "3400"))
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
 
-# Import genkit and plugins
-import genkit
-from genkit import gemini
+class GenerationHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._send_json(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": "Request body too large"})
+            return
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
+        if not isinstance(data, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return
+        config = data.get("config")
+        flow = data.get("flow")
+        if not config or not flow:
+            self._send_json(400, {"error": "Missing config or flow"})
+            return
+        if not isinstance(config, dict):
+            self._send_json(400, {"error": "config must be a JSON object"})
+            return
+        try:
+            script = generate_structured_ad_script(config, flow, data.get("variant_hint", ""))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except SchedulerTimeout as e:
+            self._send_json(503, {"error": str(e)}, headers={"Retry-After": "5"})
+            return
+        except RuntimeError as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"script": script})
 
-from ads.genkit_service import generate_ad_script
 
 if __name__ == "__main__":
     print("🚀 Starting Genkit server for AIGE script generation...")
-    print("📡 Server will be available at http://localhost:3400")
-    
+    print(f"📡 Server will be available at http://localhost:{PORT}")
+
     if not os.getenv("GOOGLE_API_KEY"):
         print("❌ ERROR: GOOGLE_API_KEY not set in environment!")
         sys.exit(1)
-    
-    # Start the Genkit dev server
-    genkit.start_server(port=3400)
+
+    # This process exists to generate, so load the SDK now rather than on the first request
+    get_genai()
+    server = ThreadingHTTPServer(("0.0.0.0", PORT), GenerationHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()